@@ -1,15 +1,36 @@
-from flask import Flask, request, jsonify
-from latex_converter import convert_tex_to_pdf_direct
-import tempfile
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
+from latex_converter import convert_latex_to_pdf_bytes, CompileCancelled, register_preamble, split_preamble, warm_formats
+from latex_preambles import RESUME_PREAMBLE, COVER_LETTER_PREAMBLE
+from prompts import SYSTEM_PROMPT, SYSTEM_PROMPT_VERSION, STRUCTURED_SYSTEM_PROMPT, STRUCTURED_PROMPT_VERSION
+from prompts import EDIT_SYSTEM_PROMPT, EDIT_PROMPT_VERSION
+from latex_render import render_resume, render_cover_letter
+from latex_preflight import LatexValidationError, preflight_latex
+from latex_sections import SectionNotFound, find_section, replace_section
+from llm_cache import GenerationCache, generation_cache_key
+from json_stream import TopLevelJSONStream
+from job_queue import JobQueue, make_broker
+from page_fetcher import PageFetcher
+from pdf_text import PDFTextExtractor
+from relevance import count_tokens, dedupe_resume_text, select_relevant_text
+from metrics import Registry, SpanRecorder, current_spans
+from pdf_cache import PDFCache, latex_cache_key
+from compile_scheduler import CompileScheduler, QueueFull
+from hedging import AttemptCancelled, DeadlineExceeded, ModelHedger
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
-import requests
-from bs4 import BeautifulSoup
 from openai import OpenAI
-import io
-from PyPDF2 import PdfReader
+import base64
+import functools
 import json
 import logging
+import multiprocessing
+import queue
+import threading
+import time
+import select
+import socket
+import ssl
 
 # Optional: enable CORS for local frontend (install flask-cors if you need it)
 try:
@@ -26,6 +47,15 @@ logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4")  # change to gpt-3.5-turbo if needed
+# "latex" (model writes full documents) or "structured" (model returns section
+# data, backend renders LaTeX). Requests can override with "output".
+GENERATION_OUTPUT = os.getenv("GENERATION_OUTPUT", "latex")
+# Prompt token budgets for the job posting and resume, and how much raw text to
+# extract before relevance selection picks from it
+JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", 1200))
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", 2500))
+JOB_MAX_CHARS = int(os.getenv("JOB_MAX_CHARS", 20000))
+RESUME_MAX_CHARS = int(os.getenv("RESUME_MAX_CHARS", 20000))
 
 if OPENAI_API_KEY:
     client = OpenAI(api_key = OPENAI_API_KEY)
@@ -33,63 +63,215 @@ else:
     client = OpenAI()
     logger.warning("OPENAI_API_KEY not set. Please add it to your .env file.")
 
+# Compiled PDF cache: in-memory LRU plus optional on-disk tier (set PDF_CACHE_DIR),
+# capped at PDF_CACHE_DISK_MAX_MB
+pdf_cache = PDFCache(
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_MB", 64)) * 1024 * 1024,
+    disk_dir=os.getenv("PDF_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("PDF_CACHE_DISK_MAX_MB", 1024)) * 1024 * 1024,
+)
+
+# pdflatex admission control: COMPILE_WORKERS concurrent compiles (default: cores),
+# COMPILE_MAX_QUEUE waiting requests before shedding with 503
+compile_scheduler = CompileScheduler(
+    workers=int(os.getenv("COMPILE_WORKERS", 0)) or None,
+    max_queue=int(os.getenv("COMPILE_MAX_QUEUE")) if os.getenv("COMPILE_MAX_QUEUE") else None,
+)
+COMPILE_DEADLINE_SECONDS = float(os.getenv("COMPILE_DEADLINE_SECONDS", 30))
+
+# Parsed /generate results keyed by model + prompt version + inputs; identical
+# concurrent requests share one upstream call
+generation_cache = GenerationCache(
+    max_entries=int(os.getenv("GENERATION_CACHE_SIZE", 512)),
+    ttl=int(os.getenv("GENERATION_CACHE_TTL", 24 * 3600)),
+)
+
+# Model calls behind run_generation (see hedging.py): after HEDGE_DELAY_SECONDS
+# without a reply (0: only once the first request has failed) a second request
+# goes to HEDGE_MODEL (default: the same model). Transient errors are retried
+# OPENAI_RETRIES times with OPENAI_RETRY_BACKOFF_SECONDS exponential backoff,
+# all within GENERATION_DEADLINE_SECONDS. A hedge model's reply is cached under
+# the requested model like any other result.
+model_hedger = ModelHedger(
+    delay=float(os.getenv("HEDGE_DELAY_SECONDS", 0)),
+    hedge_model=os.getenv("HEDGE_MODEL") or None,
+    retries=int(os.getenv("OPENAI_RETRIES", 2)),
+    backoff=float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", 0.5)),
+    deadline=float(os.getenv("GENERATION_DEADLINE_SECONDS", 180)),
+)
+# The hedger does the retrying, so they count against its deadline
+hedged_client = client.with_options(max_retries=0)
+# /generate/stream isn't hedged (see there); it gets the same number of retries
+stream_client = client.with_options(max_retries=model_hedger.retries)
+
+# Metrics for /metrics (Prometheus text format). Stage spans are also kept per
+# request for Server-Timing and the slow-request log; requests slower than
+# SLOW_REQUEST_SECONDS (0 disables) are logged with their stage breakdown.
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 10))
+
+metrics = Registry()
+http_requests = metrics.counter("http_requests_total", "HTTP requests by route, method and status")
+http_request_seconds = metrics.histogram("http_request_duration_seconds", "HTTP request latency including streamed bodies")
+stage_seconds = metrics.histogram("stage_duration_seconds", "Time spent per pipeline stage")
+openai_requests = metrics.counter("openai_requests_total", "OpenAI chat completion calls by model and outcome")
+openai_request_seconds = metrics.histogram("openai_request_duration_seconds", "OpenAI chat completion latency by model")
+openai_first_token_seconds = metrics.histogram("openai_first_token_seconds", "Time to the first streamed token by model")
+openai_tokens = metrics.counter("openai_tokens_total", "OpenAI tokens by model, kind (prompt/completion) and source "
+                                "(api, or estimate when a reply came without a usage block)")
+openai_generation_wins = metrics.counter("openai_generation_wins_total",
+                                         "Generations by the request that won (primary/hedge) and its model")
+pdflatex_passes = metrics.counter("pdflatex_passes_total", "pdflatex passes run")
+pdflatex_cpu_seconds = metrics.counter("pdflatex_cpu_seconds_total", "CPU time (user + system) used by pdflatex")
+pdflatex_compiles = metrics.histogram("pdflatex_passes_per_compile", "pdflatex passes per compiled document",
+                                      buckets=(1, 2, 3, 4, 5))
+
+def _request_spans():
+    return g.setdefault("spans", []) if has_request_context() else current_spans.get()
+
+spans = SpanRecorder(stage_seconds, _request_spans)
+
 app = Flask(__name__)
 if _HAS_CORS:
     CORS(app)  # allow all origins (OK for local dev)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.spans = []
+
+# Report per-request stage timings as Server-Timing, and record the request
+# once its body (which may be a stream) has been sent
+@app.after_request
+def add_server_timing(response):
+    request_spans = g.get("spans") or []
+    timings = g.get("timings") or {}
+    for stage, seconds in request_spans:
+        entry = f'{stage.replace("_", "-")};dur={seconds * 1000:.1f}'
+        if stage == "pdf_extract" and "pdf_cache" in timings:
+            entry += f';desc="cache {timings["pdf_cache"]}"'
+        response.headers.add("Server-Timing", entry)
+
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        method, status, path = request.method, response.status_code, request.path
+        response.call_on_close(lambda: record_request(route, method, status, path, started, request_spans))
+    return response
+
+# Helper: request metrics plus the slow-request log
+def record_request(route, method, status, path, started, request_spans):
+    elapsed = time.perf_counter() - started
+    http_requests.inc(route=route, method=method, status=status)
+    http_request_seconds.observe(elapsed, route=route)
+    if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+        breakdown = ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in request_spans)
+        logger.warning(f"Slow request {method} {path} -> {status} in {elapsed:.2f}s ({breakdown or 'no stages'})")
+
+# Helper: hit/miss style counters from each cache's stats() as labelled series
+_CACHE_RESULTS = ("hits", "disk_hits", "revalidated", "coalesced", "misses")
+
+def _cache_stats():
+    return {
+        "pdf": pdf_cache.stats(),
+        "generation": generation_cache.stats(),
+        "page": page_fetcher.stats(),
+        "pdf_text": pdf_text_extractor.stats(),
+    }
+
+metrics.collector("cache_lookups_total", "Cache lookups by cache and result", "counter", lambda: [
+    ({"cache": name, "result": result}, stats[result])
+    for name, stats in _cache_stats().items() for result in _CACHE_RESULTS if result in stats
+])
+metrics.collector("cache_hit_ratio", "Fraction of lookups served from cache", "gauge", lambda: [
+    ({"cache": name}, stats["hit_rate"]) for name, stats in _cache_stats().items()
+])
+metrics.collector("cache_entries", "Entries currently cached", "gauge", lambda: [
+    ({"cache": name}, stats["entries"]) for name, stats in _cache_stats().items()
+])
+metrics.collector("compile_queue_depth", "Callers waiting for a pdflatex slot", "gauge",
+                  lambda: compile_scheduler.stats()["queue_depth"])
+metrics.collector("compile_running", "pdflatex compiles in progress", "gauge",
+                  lambda: compile_scheduler.stats()["running"])
+metrics.collector("openai_hedge_requests_total", "Second requests by reason (delay: hedge, fallback: after a failure)",
+                  "counter", lambda: [
+    ({"reason": "delay"}, model_hedger.stats()["hedged"]),
+    ({"reason": "fallback"}, model_hedger.stats()["fallbacks"]),
+])
+metrics.collector("openai_retries_total", "OpenAI requests retried after a transient error", "counter",
+                  lambda: model_hedger.stats()["retried"])
+metrics.collector("openai_deadline_exceeded_total", "Generations with no valid reply within the deadline", "counter",
+                  lambda: model_hedger.stats()["timed_out"])
+metrics.collector("compile_rejected_total", "Compiles shed because the queue was full", "counter",
+                  lambda: compile_scheduler.stats()["rejected"])
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/", methods=["GET"])
 def health():
     return jsonify({"status": "ok", "message": "Backend running"}), 200
 
+@app.route("/compile-queue/stats", methods=["GET"])
+def compile_queue_stats():
+    return jsonify(compile_scheduler.stats()), 200
+
+@app.route("/generation-cache/stats", methods=["GET"])
+def generation_cache_stats():
+    return jsonify(generation_cache.stats()), 200
+
+@app.route("/hedging/stats", methods=["GET"])
+def hedging_stats():
+    return jsonify(model_hedger.stats()), 200
+
+@app.route("/page-cache/stats", methods=["GET"])
+def page_cache_stats():
+    return jsonify(page_fetcher.stats()), 200
+
+@app.route("/pdf-text-cache/stats", methods=["GET"])
+def pdf_text_cache_stats():
+    return jsonify(pdf_text_extractor.stats()), 200
+
+@app.route("/pdf-cache/stats", methods=["GET"])
+def pdf_cache_stats():
+    return jsonify(pdf_cache.stats()), 200
+
+# Job posting fetches share one pooled session and a URL-keyed text cache that
+# revalidates with ETag/Last-Modified after PAGE_CACHE_FRESH_SECONDS
+page_fetcher = PageFetcher(
+    max_entries=int(os.getenv("PAGE_CACHE_SIZE", 256)),
+    fresh_for=int(os.getenv("PAGE_CACHE_FRESH_SECONDS", 600)),
+)
+
 # Helper: extract visible text from a job posting URL (simple approach)
-def extract_text_from_url(url, max_chars=4000):
+def extract_text_from_url(url, max_chars=JOB_MAX_CHARS):
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (compatible; job-scraper/1.0)"}
-        resp = requests.get(url, headers=headers, timeout=8)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        # Prefer <article> or <main> sections if present
-        main = soup.find("article") or soup.find("main")
-        if main:
-            text = main.get_text(separator="\n", strip=True)
-        else:
-            paragraphs = soup.find_all("p")
-            if paragraphs:
-                text = "\n".join(p.get_text(strip=True) for p in paragraphs)
-            else:
-                body = soup.find("body")
-                text = body.get_text(separator="\n", strip=True) if body else soup.get_text(separator="\n", strip=True)
-
-        if len(text) > max_chars:
-            text = text[:max_chars] + "\n... [truncated]"
-        return text
+        with spans.span("job_fetch"):
+            return page_fetcher.fetch_text(url, max_chars)
     except Exception as e:
         logger.exception("Failed to fetch job posting URL")
         return f"[unable to fetch/extract job posting text: {str(e)}]"
 
+# Uploaded resume text, cached by content hash; big PDFs fan pages out to a
+# process pool of PDF_EXTRACT_WORKERS
+pdf_text_extractor = PDFTextExtractor(
+    max_entries=int(os.getenv("PDF_TEXT_CACHE_SIZE", 256)),
+    workers=int(os.getenv("PDF_EXTRACT_WORKERS", 0)) or None,
+    parallel_min_pages=int(os.getenv("PDF_EXTRACT_PARALLEL_PAGES", 8)),
+)
+
 # Helper: extract text from uploaded PDF (optional)
 def extract_text_from_pdf_bytes(file_bytes, max_chars=8000):
     try:
-        reader = PdfReader(io.BytesIO(file_bytes))
-        texts = []
-        for page in reader.pages:
-            texts.append(page.extract_text() or "")
-            if sum(len(t) for t in texts) > max_chars:
-                break
-        text = "\n".join(texts)
-        if len(text) > max_chars:
-            text = text[:max_chars] + "\n... [truncated]"
-        return text
+        timings = g.setdefault("timings", {}) if has_request_context() else None
+        with spans.span("pdf_extract"):
+            return pdf_text_extractor.extract(file_bytes, max_chars, timings=timings)
     except Exception as e:
         logger.exception("Failed to extract PDF text")
         return f"[unable to extract text from PDF: {str(e)}]"
 
-@app.route("/generate", methods=["POST"])
-def generate():
-    if not OPENAI_API_KEY:
-        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
-
+# Helper: read resume/cover letter/job description from a JSON or multipart request
+def read_generate_inputs():
     # Accept JSON or multipart/form-data (for optional file upload)
     resume_text = ""
     cover_letter = ""
@@ -100,7 +282,7 @@ def generate():
         job_description = request.form.get("jobDescription", "")
         pdf_file = request.files.get("resume_pdf")
         if pdf_file and not resume_text:
-            resume_text = extract_text_from_pdf_bytes(pdf_file.read())
+            resume_text = extract_text_from_pdf_bytes(pdf_file.read(), max_chars=RESUME_MAX_CHARS)
     else:
         data = request.get_json(force=True, silent=True) or {}
         resume_text = data.get("resume", "")
@@ -108,176 +290,560 @@ def generate():
         job_description = data.get("jobDescription", "")
 
     model = (request.get_json(silent=True) or {}).get("model") or request.args.get("model") or MODEL
+    resume_text, job_description = budget_inputs(resume_text, job_description, model)
+    return resume_text, cover_letter, job_description, model
 
-    if not resume_text:
-        return jsonify({"error": "Please provide a resume."}), 400
+# Helper: keep the relevant parts of the posting and a deduplicated resume within
+# their token budgets (see relevance.py)
+def budget_inputs(resume_text, job_description, model):
+    with spans.span("relevance"):
+        return _budget_inputs(resume_text, job_description, model)
 
-    if not job_description:
-        return jsonify({"error": "Please provide a job description."}), 400
+def _budget_inputs(resume_text, job_description, model):
+    if resume_text:
+        resume_text = dedupe_resume_text(resume_text, RESUME_TOKEN_BUDGET, model)
+    if job_description:
+        job_description = select_relevant_text(job_description, JOB_TOKEN_BUDGET, model)
+    return resume_text, job_description
+
+# Helper: True if this request wants structured output (see GENERATION_OUTPUT)
+def wants_structured_output():
+    output = request.args.get("output")
+    if output is None:
+        if request.content_type and "multipart/form-data" in request.content_type:
+            output = request.form.get("output")
+        else:
+            output = (request.get_json(force=True, silent=True) or {}).get("output")
+    return (output or GENERATION_OUTPUT) == "structured"
 
-    system_prompt = (
-        "You are an expert job-application assistant. "
-        "Given a candidate's resume text and a job description, "
-        "produce a JSON object only (no extra commentary) with the following keys:\n\n"
-
-        "CRITICAL: DO NOT HALLUCINATE OR MAKE UP FALSE INFORMATION.\n"
-        "- ONLY use information actually provided in the candidate's resume\n"
-        "- DO NOT invent companies, positions, projects, or experiences\n"
-        "- DO NOT fabricate achievements, metrics, or dates\n"
-        "- DO NOT add fake contact information (use placeholder format if info missing)\n"
-        "- You may reformat, reorganize, and enhance presentation of EXISTING information\n"
-        "- You may tailor wording to match job description keywords from REAL experience\n"
-        "- If resume lacks certain information, use generic placeholders (e.g., 'City, State', 'email@example.com')\n\n"
-
-        "1. optimized_resume: A professional, ATS-friendly resume in LaTeX format. "
-        "MUST include this COMPLETE preamble with all custom command definitions:\n\n"
-        "\\DocumentMetadata{}\n"
-        "\\documentclass[letterpaper,11pt]{article}\n"
-        "\\usepackage{latexsym}\n"
-        "\\usepackage[empty]{fullpage}\n"
-        "\\usepackage{titlesec}\n"
-        "\\usepackage{marvosym}\n"
-        "\\usepackage[usenames,dvipsnames]{color}\n"
-        "\\usepackage{verbatim}\n"
-        "\\usepackage{enumitem}\n"
-        "\\usepackage[hidelinks]{hyperref}\n"
-        "\\usepackage{fancyhdr}\n"
-        "\\usepackage{tabularx}\n"
-        "\\pagestyle{fancy}\n"
-        "\\fancyhf{}\n"
-        "\\renewcommand{\\headrulewidth}{0pt}\n"
-        "\\addtolength{\\oddsidemargin}{-0.5in}\n"
-        "\\addtolength{\\evensidemargin}{-0.5in}\n"
-        "\\addtolength{\\textwidth}{1in}\n"
-        "\\addtolength{\\topmargin}{-.5in}\n"
-        "\\addtolength{\\textheight}{1.0in}\n"
-        "\\urlstyle{same}\n"
-        "\\raggedbottom\n"
-        "\\raggedright\n"
-        "\\setlength{\\tabcolsep}{0in}\n"
-        "\\titleformat{\\section}{\\vspace{-4pt}\\scshape\\raggedright\\large}{}{0em}{}[\\color{black}\\titlerule \\vspace{-5pt}]\n"
-        "\\newcommand{\\resumeItem}[1]{\\item\\small{{#1 \\vspace{-2pt}}}}\n"
-        "\\newcommand{\\resumeSubheading}[4]{\\vspace{-2pt}\\item\\begin{tabular*}{0.97\\textwidth}[t]{l@{\\extracolsep{\\fill}}r}\\textbf{#1} & #2 \\\\\\textit{\\small#3} & \\textit{\\small #4} \\\\\\end{tabular*}\\vspace{-7pt}}\n"
-        "\\newcommand{\\resumeProjectHeading}[2]{\\item\\begin{tabular*}{0.97\\textwidth}{l@{\\extracolsep{\\fill}}r}\\small#1 & #2 \\\\\\end{tabular*}\\vspace{-7pt}}\n"
-        "\\newcommand{\\resumeSubHeadingListStart}{\\begin{itemize}[leftmargin=0.15in, label={}]}\n"
-        "\\newcommand{\\resumeSubHeadingListEnd}{\\end{itemize}}\n"
-        "\\newcommand{\\resumeItemListStart}{\\begin{itemize}}\n"
-        "\\newcommand{\\resumeItemListEnd}{\\end{itemize}\\vspace{-5pt}}\n\n"
-
-        "Then include content sections:\n"
-        "- HEADING: \\begin{center}\\textbf{\\Huge \\scshape Name} with contact info (phone, email, LinkedIn, GitHub)\\end{center}\n\n"
-
-        "- EDUCATION: \\section{Education}\\resumeSubHeadingListStart\\resumeSubheading{School}{Dates}{Degree}{Location}\\resumeSubHeadingListEnd\n"
-        "  * Include GPA if 3.5+, relevant coursework, honors, or awards\n\n"
-
-        "- EXPERIENCE: \\section{Experience}\\resumeSubHeadingListStart\n"
-        "  * For EACH position: \\resumeSubheading{Position}{Dates}{Company}{Location}\\resumeItemListStart\n"
-        "  * Include 4-6 bullet points per position using \\resumeItem{}\n"
-        "  * Start each bullet with strong action verbs (Developed, Built, Led, Designed, Implemented, Optimized, etc.)\n"
-        "  * QUANTIFY achievements with metrics (increased by X%, reduced by Y hours, processed Z requests, etc.)\n"
-        "  * Highlight technologies/tools used that match job description\n"
-        "  * Show impact and results, not just responsibilities\n"
-        "  * Even if limited info provided, infer realistic technical achievements based on role\n"
-        "  * \\resumeItemListEnd\\resumeSubHeadingListEnd\n\n"
-
-        "- PROJECTS: \\section{Projects}\\resumeSubHeadingListStart\n"
-        "  * Include 2-3 relevant projects if applicable\n"
-        "  * Format: \\resumeProjectHeading{\\textbf{Project Name} $|$ \\emph{Tech Stack}}{Date}\\resumeItemListStart\n"
-        "  * 2-3 bullet points per project describing features, impact, and technologies\n"
-        "  * \\resumeItemListEnd\\resumeSubHeadingListEnd\n\n"
-
-        "- TECHNICAL SKILLS: \\section{Technical Skills}\\begin{itemize}[leftmargin=0.15in, label={}]\\small{\\item{\n"
-        "  \\textbf{Languages}{: List all programming languages} \\\\\n"
-        "  \\textbf{Frameworks}{: List frameworks and libraries} \\\\\n"
-        "  \\textbf{Developer Tools}{: Git, Docker, CI/CD, cloud platforms, etc.} \\\\\n"
-        "  \\textbf{Libraries}{: Relevant libraries}\n"
-        "  }}\\end{itemize}\n\n"
-
-        "- OPTIONAL SECTIONS (add if relevant):\n"
-        "  * Certifications: AWS, Google Cloud, etc.\n"
-        "  * Leadership/Activities: clubs, volunteer work\n"
-        "  * Publications/Research: if applicable\n\n"
-
-        "- End with \\end{document}\n\n"
-
-        "IMPORTANT GUIDELINES:\n"
-        "- Tailor content to match job description keywords using ACTUAL experience from resume\n"
-        "- Use strong action verbs and quantify achievements (only if data exists in resume)\n"
-        "- Reformat and reorganize existing information for better presentation\n"
-        "- Highlight transferable skills and relevant technologies mentioned in resume\n"
-        "- DO NOT add experience, skills, or details not present in original resume\n"
-        "- Properly escape LaTeX special chars (\\&, \\%, \\$, \\#, \\_)\n\n"
-
-        "2. optimized_cover_letter: Professional cover letter in simple LaTeX article format. "
-        "MUST include this COMPLETE structure:\n\n"
-        "\\DocumentMetadata{}\n"
-        "\\documentclass[11pt,letterpaper]{article}\n"
-        "\\usepackage[margin=1in]{geometry}\n"
-        "\\usepackage{parskip}\n"
-        "\\begin{document}\n"
-        "\\pagestyle{empty}\n\n"
-        "\\begin{flushleft}\n"
-        "First Last\\\\\\\\\n"
-        "Phone\\\\\\\\\n"
-        "Email\n"
-        "\\end{flushleft}\n\n"
-        "\\vspace{0.5cm}\n\n"
-        "\\today\n\n"
-        "\\vspace{0.5cm}\n\n"
-        "Hiring Manager\\\\\\\\\n"
-        "Company Name\n\n"
-        "\\vspace{0.5cm}\n\n"
-        "Dear Hiring Manager,\n\n"
-        "3-4 paragraphs highlighting ACTUAL experience from resume tailored to job description.\n"
-        "DO NOT fabricate experience or make false claims.\n"
-        "Only reference real skills and achievements from the provided resume.\n\n"
-        "Sincerely,\n\n"
-        "First Last\n\n"
-        "\\end{document}\n\n"
-
-        "3. resume_suggestions: Array of 3-5 actionable suggestions (each <= 2 sentences)\n\n"
-
-        "Return ONLY valid JSON.\n"
-    )
-
-    user_content = {
+# Helper: chat messages for one generation
+def build_user_content(resume_text, cover_letter, job_description):
+    return {
         "resume_text": resume_text,
         "cover_letter": cover_letter,
         "job_description": job_description
     }
 
+def build_messages(resume_text, cover_letter, job_description, structured=False):
+    user_content = build_user_content(resume_text, cover_letter, job_description)
+    return [
+        {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT if structured else SYSTEM_PROMPT},
+        {"role": "user", "content": "Here are the inputs (JSON):\n" + json.dumps(user_content, ensure_ascii=False)}
+    ]
+
+# Helper: parse the model's JSON reply, tolerating commentary around the object.
+# Raises ValueError if no JSON object can be recovered.
+def parse_model_reply(reply):
+    try:
+        return json.loads(reply)
+    except Exception:
+        # Try to extract JSON substring if the model added commentary
+        start = reply.find("{")
+        end = reply.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            try:
+                return json.loads(reply[start:end+1])
+            except Exception:
+                logger.exception("Failed to parse JSON from model reply")
+                raise ValueError("Model output was not valid JSON")
+        logger.error("Model output not JSON: %s", reply)
+        raise ValueError("Model output was not valid JSON")
+
+class InvalidModelOutput(ValueError):
+    """The model replied with something that isn't the JSON object we asked for"""
+
+    def __init__(self, raw_output):
+        super().__init__("Model output was not valid JSON")
+        self.raw_output = raw_output
+
+# Structured-mode keys and the LaTeX documents they are rendered into
+STRUCTURED_RENDERERS = {
+    "resume": ("optimized_resume", render_resume),
+    "cover_letter": ("optimized_cover_letter", render_cover_letter),
+}
+
+# Helper: map one structured key/value to the key/value clients expect
+def render_structured_part(key, value):
+    if key not in STRUCTURED_RENDERERS:
+        return key, value
+    name, render = STRUCTURED_RENDERERS[key]
     try:
-        response = client.chat.completions.create(
+        return name, render(value)
+    except (AttributeError, TypeError) as e:
+        raise InvalidModelOutput(json.dumps({key: value}, ensure_ascii=False)) from e
+
+# Helper: structured reply -> the usual result keys, keeping the section data
+# next to the rendered LaTeX
+def render_structured_result(parsed):
+    result = {}
+    for key, value in parsed.items():
+        name, rendered = render_structured_part(key, value)
+        result[name] = rendered
+        if name != key:
+            result[key] = value
+    return result
+
+def generation_key(resume_text, cover_letter, job_description, model, structured=False):
+    return generation_cache_key(model, STRUCTURED_PROMPT_VERSION if structured else SYSTEM_PROMPT_VERSION,
+                                build_user_content(resume_text, cover_letter, job_description))
+
+# Streamed completions end with a usage chunk when asked. The pinned SDK
+# predates the stream_options argument, so it goes in the request body.
+STREAM_USAGE = {"stream_options": {"include_usage": True}}
+
+# Helper: latency and token counts for one completed OpenAI call. usage is the
+# API's usage block (an object, or a dict on a stream chunk), or a (prompt,
+# completion) tokenizer estimate when the reply had none.
+def record_openai_call(model, seconds, usage):
+    openai_requests.inc(model=model, outcome="ok")
+    openai_request_seconds.observe(seconds, model=model)
+    if usage is None:
+        return
+    source = "api"
+    if isinstance(usage, tuple):
+        prompt_tokens, completion_tokens = usage
+        source = "estimate"
+    elif isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    else:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    openai_tokens.inc(prompt_tokens, model=model, kind="prompt", source=source)
+    openai_tokens.inc(completion_tokens, model=model, kind="completion", source=source)
+
+# Helper: the usage block of a streamed call (from its last chunk), else a
+# (prompt, completion) estimate with the tokenizer
+def streamed_usage(model, messages, reply, usage=None):
+    if usage:
+        return usage
+    return sum(count_tokens(m["content"], model) for m in messages), count_tokens(reply, model)
+
+# Helper: one streamed completion for model_hedger. Streaming lets a losing or
+# late request stop between chunks; closing the connection stops the model.
+def stream_completion(model, messages, cancel, deadline):
+    started = time.perf_counter()
+    chunks = []
+    usage = None
+    try:
+        stream = hedged_client.chat.completions.create(
             model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": "Here are the inputs (JSON):\n" + json.dumps(user_content, ensure_ascii=False)}
-            ],
+            messages=messages,
             temperature=0.2,
+            stream=True,
+            timeout=max(0.1, deadline - time.monotonic()),
+            extra_body=STREAM_USAGE,
         )
+        with stream:
+            for chunk in stream:
+                if cancel.is_set():
+                    raise AttemptCancelled()
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Model reply still streaming at the deadline")
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                if not chunks:
+                    openai_first_token_seconds.observe(time.perf_counter() - started, model=model)
+                chunks.append(chunk.choices[0].delta.content or "")
+    except AttemptCancelled:
+        openai_requests.inc(model=model, outcome="cancelled")
+        raise
+    except Exception:
+        openai_requests.inc(model=model, outcome="error")
+        raise
+    reply = "".join(chunks)
+    record_openai_call(model, time.perf_counter() - started, streamed_usage(model, messages, reply, usage))
+    return reply
+
+# Helper: which request of a hedged call won, and how long it took
+def record_generation_win(info):
+    openai_generation_wins.inc(path=info["path"], model=info["model"])
+    if info["path"] != "primary":
+        logger.info(f"Hedge request ({info['model']}) won after {info['seconds']:.2f}s")
+
+# Helper: complete model reply -> result dict. Raises InvalidModelOutput.
+def finish_model_reply(reply, structured=False):
+    reply = reply.strip()
+    logger.debug("Raw model reply: %s", reply)
+    try:
+        parsed = parse_model_reply(reply)
+    except ValueError:
+        raise InvalidModelOutput(reply)
+    return render_structured_result(parsed) if structured else parsed
+
+# Helper: one full generation. Returns the parsed result dict. Served from
+# generation_cache when the same inputs were seen recently; otherwise through
+# model_hedger, so it raises DeadlineExceeded when no reply is in time.
+def run_generation(resume_text, cover_letter, job_description, model, structured=False):
+    key = generation_key(resume_text, cover_letter, job_description, model, structured)
+    messages = build_messages(resume_text, cover_letter, job_description, structured)
+
+    def attempt(attempt_model, cancel, deadline):
+        return finish_model_reply(stream_completion(attempt_model, messages, cancel, deadline), structured)
+
+    def call_model():
+        with spans.span("openai"):
+            parsed, info = model_hedger.call(attempt, model)
+        record_generation_win(info)
+        return parsed
+
+    parsed, source = generation_cache.get_or_compute(key, call_model)
+    if source != "miss":
+        logger.info(f"Generation cache {source} for {key[:12]}")
+    return parsed
+
+# Worker for async /generate jobs: runs the model call and, if asked, compiles
+# both documents. PDFs are returned base64-encoded next to the parsed result.
+def run_generation_job(payload):
+    parsed = run_generation(payload["resume_text"], payload["cover_letter"],
+                            payload["job_description"], payload["model"],
+                            payload.get("structured", False))
+    output = {"result": parsed}
+    if payload.get("compile"):
+        output.update(compile_result_pdfs(parsed))
+    return output
 
-        reply = response.choices[0].message.content.strip()
-        logger.debug("Raw model reply: %s", reply)
+# Helper: compile the resume and cover letter of a result. Returns
+# {"pdfs": {key: base64}} plus "pdf_errors" for documents that failed.
+def compile_result_pdfs(parsed):
+    pdfs = {}
+    pdf_errors = {}
+    for key in ("optimized_resume", "optimized_cover_letter"):
+        latex_content = (parsed.get(key) or "").strip()
+        if not latex_content:
+            continue
         try:
-            parsed = json.loads(reply)
-        except Exception:
-            # Try to extract JSON substring if the model added commentary
-            start = reply.find("{")
-            end = reply.rfind("}")
-            if start != -1 and end != -1 and end > start:
-                try:
-                    parsed = json.loads(reply[start:end+1])
-                except Exception:
-                    logger.exception("Failed to parse JSON from model reply")
-                    return jsonify({"error": "Model output was not valid JSON", "raw_output": reply}), 500
-            else:
-                logger.error("Model output not JSON: %s", reply)
-                return jsonify({"error": "Model output was not valid JSON", "raw_output": reply}), 500
+            pdf_bytes, _ = compile_latex(latex_content)
+            pdfs[key] = base64.b64encode(pdf_bytes).decode("ascii")
+        except Exception as e:
+            logger.exception(f"Failed to compile {key}")
+            pdf_errors[key] = str(e)
+    output = {"pdfs": pdfs}
+    if pdf_errors:
+        output["pdf_errors"] = pdf_errors
+    return output
+
+# Async generation: JOB_WORKERS concurrent jobs, finished jobs kept JOB_RESULT_TTL
+# seconds. JOB_BROKER is "memory" or "sqlite:///path/to/jobs.db"; with SQLite a
+# job whose process died is retried after JOB_LEASE_SECONDS, then failed.
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+generation_jobs = JobQueue(
+    run_generation_job,
+    broker=make_broker(os.getenv("JOB_BROKER", "memory"), result_ttl=JOB_RESULT_TTL,
+                       lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", 60))),
+    workers=int(os.getenv("JOB_WORKERS", 4)),
+    result_ttl=JOB_RESULT_TTL,
+)
+
+# Helper: boolean option from the query string, JSON body or form
+def _request_flag(name):
+    value = request.args.get(name)
+    if value is None:
+        if request.content_type and "multipart/form-data" in request.content_type:
+            value = request.form.get(name)
+        else:
+            value = (request.get_json(force=True, silent=True) or {}).get(name)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    record = generation_jobs.status(job_id)
+    if record is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    return jsonify(record), 200
+
+@app.route("/generate", methods=["POST"])
+def generate():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    resume_text, cover_letter, job_description, model = read_generate_inputs()
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    if not job_description:
+        return jsonify({"error": "Please provide a job description."}), 400
+
+    structured = wants_structured_output()
 
+    if _request_flag("async"):
+        job_id = generation_jobs.submit({
+            "resume_text": resume_text,
+            "cover_letter": cover_letter,
+            "job_description": job_description,
+            "model": model,
+            "compile": _request_flag("compile"),
+            "structured": structured,
+        })
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+    try:
+        parsed = run_generation(resume_text, cover_letter, job_description, model, structured)
         return jsonify({"result": parsed})
+    except InvalidModelOutput as e:
+        return jsonify({"error": "Model output was not valid JSON", "raw_output": e.raw_output}), 500
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        return jsonify({"error": "The model did not reply in time, please retry.", "details": str(e)}), 504
     except Exception as e:
         logger.exception("Error in generate endpoint")
         return jsonify({"error": "Error processing request", "details": str(e)}), 500
+
+# Helper: format one Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Helper: metrics for a streamed call; usage is its usage chunk, if one came
+def record_streamed_call(model, messages, reply, elapsed, usage=None):
+    spans.record("openai", elapsed)
+    record_openai_call(model, elapsed, streamed_usage(model, messages, reply, usage))
+
+# Helper: SSE events after the model stream ends: keys the incremental parser
+# missed, then "done" with the whole result (which is also cached)
+def finish_stream_events(parser, reply, structured, cache_key):
+    logger.debug("Raw model reply: %s", reply)
+    result = parser.completed
+    if not parser.done:
+        # The incremental parser gave up (e.g. trailing commentary inside the
+        # object); fall back to parsing the whole reply and send what's left
+        try:
+            result = parse_model_reply(reply)
+        except ValueError:
+            yield sse_event("error", {"error": "Model output was not valid JSON", "raw_output": reply})
+            return
+        for key, value in result.items():
+            if key not in parser.completed:
+                if structured:
+                    try:
+                        key, value = render_structured_part(key, value)
+                    except InvalidModelOutput as e:
+                        yield sse_event("error", {"error": str(e), "raw_output": e.raw_output})
+                        return
+                yield sse_event(key, value)
+    if structured:
+        result = render_structured_result(result)
+    generation_cache.put(cache_key, result)
+    yield sse_event("done", {"result": result})
+
+# Streaming variant of /generate. Emits one SSE event per top-level key of the
+# model's JSON (resume_suggestions, optimized_resume, optimized_cover_letter) as
+# soon as it is complete, then a final "done" event with the whole result.
+# Not hedged: events already sent can't be taken back, so a second request
+# can't take over halfway. It gets model_hedger's retries (the SDK only
+# retries before the reply starts) and GENERATION_DEADLINE_SECONDS.
+@app.route("/generate/stream", methods=["POST"])
+def generate_stream():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    resume_text, cover_letter, job_description, model = read_generate_inputs()
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    if not job_description:
+        return jsonify({"error": "Please provide a job description."}), 400
+
+    structured = wants_structured_output()
+    messages = build_messages(resume_text, cover_letter, job_description, structured)
+    cache_key = generation_key(resume_text, cover_letter, job_description, model, structured)
+
+    def events():
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Generation cache hit for {cache_key[:12]}")
+            for key, value in cached.items():
+                yield sse_event(key, value)
+            yield sse_event("done", {"result": cached})
+            return
+
+        parser = TopLevelJSONStream()
+        chunks = []
+        usage = None
+        started = time.perf_counter()
+        deadline = time.monotonic() + model_hedger.deadline
+        try:
+            stream = stream_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.2,
+                stream=True,
+                timeout=model_hedger.deadline,
+                extra_body=STREAM_USAGE,
+            )
+            for chunk in stream:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Model reply still streaming at the deadline")
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not chunks:
+                    openai_first_token_seconds.observe(time.perf_counter() - started, model=model)
+                chunks.append(delta)
+                for key, value in parser.feed(delta):
+                    if structured:
+                        key, value = render_structured_part(key, value)
+                    yield sse_event(key, value)
+        except Exception as e:
+            logger.exception("Error in generate stream")
+            openai_requests.inc(model=model, outcome="error")
+            yield sse_event("error", {"error": "Error processing request", "details": str(e)})
+            return
+
+        reply = "".join(chunks).strip()
+        record_streamed_call(model, messages, reply, time.perf_counter() - started, usage)
+        yield from finish_stream_events(parser, reply, structured, cache_key)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Helper: validate and repair LaTeX before it reaches pdflatex (ampersands,
+# \DocumentMetadata, tagging fix, braces, environments, stray specials). The
+# result is also what the PDF cache is keyed on. Raises LatexValidationError
+# for documents that would fail to compile.
+def prepare_latex(latex_content):
+    with spans.span("latex_preflight"):
+        result = preflight_latex(latex_content)
+    if not result.ok:
+        raise LatexValidationError(result.errors)
+    return result.latex
+
+# Helper: returns a callable that reports whether the client has hung up.
+# Only the werkzeug server exposes the socket, and only a plain one can be
+# peeked at (TLS sockets reject MSG_PEEK); elsewhere it always says no.
+def client_disconnect_probe(environ):
+    sock = environ.get("werkzeug.socket")
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return lambda: False
+
+    def disconnected():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # Readable with no data means the peer closed the connection
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+        except ValueError:
+            # Can't tell (e.g. the socket was already detached)
+            return False
+        except OSError:
+            return True
+    return disconnected
+
+# Precompiled formats for the fixed preambles. prepare_latex() adds the tagging
+# fix, so register each preamble exactly as the converter will receive it.
+for _name, _preamble in (("resume", RESUME_PREAMBLE), ("cover-letter", COVER_LETTER_PREAMBLE)):
+    register_preamble(_name, split_preamble(prepare_latex(_preamble + "\\begin{document}\n"))[0])
+# Not in PDF text worker processes, which import this module again when it is
+# run as a script
+if os.getenv("LATEX_PRECOMPILE_FORMATS", "1") == "1" and multiprocessing.parent_process() is None:
+    threading.Thread(target=warm_formats, daemon=True).start()
+
+# Debug copy of the last compiled LaTeX (for troubleshooting), written in the
+# background only when LATEX_DEBUG_DUMP=1
+LATEX_DEBUG_DUMP = os.getenv("LATEX_DEBUG_DUMP", "0") == "1"
+DEBUG_DUMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'last_generated.tex')
+_debug_dump_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="latex-debug-dump")
+
+def _write_debug_dump(latex_content):
+    try:
+        with open(DEBUG_DUMP_PATH, 'w') as f:
+            f.write(latex_content)
+        logger.info(f"Saved debug LaTeX to {DEBUG_DUMP_PATH}")
+    except Exception as e:
+        logger.warning(f"Could not save debug LaTeX: {e}")
+
+# The class file for \documentclass{resume}; linked into the compile directory
+RESUME_CLS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'LaTex', 'resume.cls')
+
+# Helper: first half of a compile: rewrites and the PDF cache lookup.
+# Returns (prepared latex, cache key, cached PDF or None, assets to link).
+def begin_compile(latex_content):
+    latex_content = prepare_latex(latex_content)
+
+    cache_key = latex_cache_key(latex_content)
+    cached_pdf = pdf_cache.get(cache_key)
+    if cached_pdf is not None:
+        logger.info(f"PDF cache hit for {cache_key[:12]}")
+        return latex_content, cache_key, cached_pdf, None
+
+    if LATEX_DEBUG_DUMP:
+        _debug_dump_writer.submit(_write_debug_dump, latex_content)
+
+    # Only use the cls file if it exists and the LaTeX references it
+    use_cls = '\\documentclass{resume}' in latex_content and os.path.exists(RESUME_CLS_PATH)
+    return latex_content, cache_key, None, [RESUME_CLS_PATH] if use_cls else None
+
+# Helper: pdflatex metrics for one compile, successful or not
+def record_compile(compile_stats):
+    pdflatex_passes.inc(compile_stats.get('passes', 0))
+    pdflatex_cpu_seconds.inc(compile_stats.get('cpu_seconds', 0.0))
+
+# Helper: second half of a successful compile. Returns (pdf_bytes, info).
+def finish_compile(cache_key, pdf_bytes, compile_stats):
+    pdflatex_compiles.observe(compile_stats.get('passes', 0))
+    logger.info(f"Compiled PDF in {compile_stats.get('passes', 0)} pdflatex pass(es), "
+                f"{compile_stats.get('cpu_seconds', 0.0):.2f}s CPU")
+    pdf_cache.put(cache_key, pdf_bytes)
+    return pdf_bytes, {"cache": "miss", "passes": compile_stats.get('passes', 0)}
+
+# Helper: LaTeX string -> PDF bytes through the rewrites, the PDF cache and the
+# compile scheduler. Returns (pdf_bytes, info) where info has "cache" and, on a
+# miss, "passes". Raises LatexValidationError for unrepairable input and
+# QueueFull/TimeoutError/CompileCancelled like the scheduler.
+def compile_latex(latex_content, cancel=None):
+    latex_content, cache_key, cached_pdf, assets = begin_compile(latex_content)
+    if cached_pdf is not None:
+        return cached_pdf, {"cache": "hit"}
+
+    compile_stats = {}
+    try:
+        # Includes the wait for a compile slot (see /compile-queue/stats)
+        with spans.span("pdflatex"):
+            pdf_bytes = compile_scheduler.run(
+                convert_latex_to_pdf_bytes, latex_content, assets,
+                stats=compile_stats,
+                deadline=time.monotonic() + COMPILE_DEADLINE_SECONDS,
+                cancel=cancel,
+            )
+    finally:
+        record_compile(compile_stats)
+    return finish_compile(cache_key, pdf_bytes, compile_stats)
+
+# Helper: PDF response headers for a compile_latex() result
+def pdf_response_headers(info):
+    headers = {
+        'Content-Type': 'application/pdf',
+        'Content-Disposition': 'attachment; filename="document.pdf"',
+        'X-PDF-Cache': info["cache"]
+    }
+    if "passes" in info:
+        headers['X-LaTeX-Passes'] = str(info["passes"])
+    return headers
+
+# Helper: compile error -> (JSON body, status[, headers]) for /convert-latex-to-pdf
+def compile_error_response(e):
+    if isinstance(e, LatexValidationError):
+        logger.warning(f"Rejected LaTeX before compiling: {e}")
+        return {"error": "LaTeX failed validation", "details": e.errors}, 422
+    if isinstance(e, QueueFull):
+        logger.warning(str(e))
+        return {"error": "Server is busy compiling other documents, please retry."}, 503, {
+            'Retry-After': str(e.retry_after)
+        }
+    if isinstance(e, TimeoutError):
+        logger.warning(f"LaTeX conversion timed out: {e}")
+        return {"error": "LaTeX to PDF conversion timed out", "details": str(e)}, 504
+    if isinstance(e, CompileCancelled):
+        logger.info("Client disconnected, pdflatex was stopped")
+        return {"error": "Client disconnected"}, 499
+    if isinstance(e, FileNotFoundError):
+        logger.exception("File not found during LaTeX conversion")
+        return {"error": str(e)}, 404
+    logger.exception("Failed to convert LaTeX to PDF")
+    return {"error": "LaTeX to PDF conversion failed", "details": str(e)}, 500
+
 #Convert LaTex into pdf
 @app.route("/convert-latex-to-pdf", methods=["POST"])
 def convert_latex_to_pdf():
@@ -291,106 +857,319 @@ def convert_latex_to_pdf():
     # Log the first 500 chars of LaTeX for debugging
     logger.info(f"Received LaTeX content (first 500 chars):\n{latex_content[:500]}")
 
-    # FIX: Escape unescaped ampersands in document content (not in preamble command definitions)
-    # Only escape & that appear after \begin{document}
-    import re
-    if '\\begin{document}' in latex_content:
-        parts = latex_content.split('\\begin{document}', 1)
-        preamble = parts[0]
-        content = parts[1] if len(parts) > 1 else ''
+    try:
+        pdf_bytes, info = compile_latex(latex_content, cancel=client_disconnect_probe(request.environ))
 
-        # Count unescaped ampersands in content only
-        unescaped_count = len(re.findall(r'(?<!\\)&', content))
+        # Return PDF as binary response
+        return pdf_bytes, 200, pdf_response_headers(info)
+    except Exception as e:
+        return compile_error_response(e)
 
-        # Escape & in content only (not in preamble where they're used for tabular column separators)
-        content = re.sub(r'(?<!\\)&', r'\\&', content)
+# Fan-out: one resume against many postings. BATCH_MAX_POSTINGS per request.
+# Each posting goes through two stages with their own workers: fetching
+# (BATCH_FETCH_CONCURRENCY at once) and generating plus compiling
+# (BATCH_LLM_CONCURRENCY at once), so postings waiting for a model call never
+# hold up the fetches behind them.
+BATCH_MAX_POSTINGS = int(os.getenv("BATCH_MAX_POSTINGS", 20))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", 8))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
 
-        latex_content = preamble + '\\begin{document}' + content
+# Helper: normalize the "postings" list of a batch request. Each item is a URL
+# string, a job description string, or {"url"|"jobDescription", "id"}.
+# Returns [{"index", "id", "url", "job_description"}]; raises ValueError.
+def parse_batch_postings(raw):
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise ValueError("postings must be a JSON array")
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("Please provide a non-empty postings array.")
+    if len(raw) > BATCH_MAX_POSTINGS:
+        raise ValueError(f"At most {BATCH_MAX_POSTINGS} postings per request.")
+    postings = []
+    for index, item in enumerate(raw):
+        if isinstance(item, str):
+            item = {"url": item} if item.strip().lower().startswith(("http://", "https://")) else {"jobDescription": item}
+        if not isinstance(item, dict) or not (item.get("url") or item.get("jobDescription")):
+            raise ValueError(f"Posting {index} needs a url or a jobDescription.")
+        postings.append({
+            "index": index,
+            "id": item.get("id", index),
+            "url": (item.get("url") or "").strip() or None,
+            "job_description": item.get("jobDescription") or "",
+        })
+    return postings
 
-        if unescaped_count > 0:
-            logger.info(f"Escaped {unescaped_count} unescaped ampersands in document content")
+# Helper: the resume, cover letter, postings and options of a batch request.
+# The resume (text or PDF) is extracted and budgeted once for all postings.
+def read_batch_inputs():
+    if request.content_type and "multipart/form-data" in request.content_type:
+        data = request.form
+        resume_text = data.get("resume", "")
+        pdf_file = request.files.get("resume_pdf")
+        if pdf_file and not resume_text:
+            resume_text = extract_text_from_pdf_bytes(pdf_file.read(), max_chars=RESUME_MAX_CHARS)
+    else:
+        data = request.get_json(force=True, silent=True) or {}
+        resume_text = data.get("resume", "")
+    model = data.get("model") or request.args.get("model") or MODEL
+    postings = parse_batch_postings(data.get("postings"))
+    if resume_text:
+        resume_text = budget_inputs(resume_text, "", model)[0]
+    return resume_text, data.get("coverLetter", ""), postings, model
 
-    # FIX: Ensure DocumentMetadata is present for TeX Live 2024+ compatibility
-    # This prevents "Forbidden control sequence" errors with the new tagging system
-    if '\\DocumentMetadata' not in latex_content:
-        # Check if it starts with \documentclass
-        if latex_content.strip().startswith('\\documentclass'):
-            logger.info("Adding \\DocumentMetadata{} to LaTeX content for TeX Live 2024+ compatibility")
-            latex_content = '\\DocumentMetadata{}\n' + latex_content
-        else:
-            # Find the \documentclass line and insert before it
-            lines = latex_content.split('\n')
-            for i, line in enumerate(lines):
-                if line.strip().startswith('\\documentclass'):
-                    logger.info(f"Inserting \\DocumentMetadata{{}} before \\documentclass at line {i}")
-                    lines.insert(i, '\\DocumentMetadata{}')
-                    latex_content = '\n'.join(lines)
-                    break
-
-    # Additional fix: Disable tagging in tabular environments to prevent errors
-    # Find \begin{document} and insert the fix right after it
-    if '\\begin{document}' in latex_content and 'tagpdfparaOff' not in latex_content:
-        logger.info("Adding tabular tagging fix for TeX Live 2024+ compatibility")
-        tagging_fix = r'''
-% Fix for TeX Live 2024+ tagging system in tabular environments
-\makeatletter
-\@ifundefined{tagpdfparaOff}{}{
-  \AddToHook{env/tabular*/begin}{\tagpdfparaOff}
-  \AddToHook{env/tabular*/end}{\tagpdfparaOn}
-  \AddToHook{env/tabular/begin}{\tagpdfparaOff}
-  \AddToHook{env/tabular/end}{\tagpdfparaOn}
-}
-\makeatother
-'''
-        latex_content = latex_content.replace('\\begin{document}', tagging_fix + '\n\\begin{document}')
+# Helper: the SSE event fields that identify a batch posting
+def batch_posting_event(posting):
+    event = {"index": posting["index"], "id": posting["id"]}
+    if posting["url"]:
+        event["url"] = posting["url"]
+    return event
 
-    temp_tex_path = None
+# Helper: first stage of a batch posting: fetch (if it's a URL) and budget its
+# job description. Returns (job_description, None), or (None, the SSE
+# (event, data) to send instead).
+def fetch_batch_posting(posting, model):
+    event = batch_posting_event(posting)
     try:
-        # Save debug copy of LaTeX (for troubleshooting)
-        debug_path = os.path.join(os.path.dirname(__file__), 'last_generated.tex')
-        try:
-            with open(debug_path, 'w') as f:
-                f.write(latex_content)
-            logger.info(f"Saved debug LaTeX to {debug_path}")
-        except Exception as e:
-            logger.warning(f"Could not save debug LaTeX: {e}")
-
-        # Write LaTeX to a temp file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.tex', delete=False) as tf:
-            tf.write(latex_content)
-            temp_tex_path = tf.name
-
-        # Convert to PDF
-        # The new professional template is self-contained (doesn't need .cls file)
-        # But we keep the cls_path for backwards compatibility
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        cls_path = os.path.join(backend_dir, 'LaTex', 'resume.cls')
-
-        # Only use cls file if it exists and LaTeX references it
-        if '\\documentclass{resume}' in latex_content and os.path.exists(cls_path):
-            pdf_bytes = convert_tex_to_pdf_direct(temp_tex_path, cls_path)
-        else:
-            pdf_bytes = convert_tex_to_pdf_direct(temp_tex_path, None)
+        job_description = posting["job_description"]
+        if posting["url"]:
+            try:
+                with spans.span("job_fetch"):
+                    job_description = page_fetcher.fetch_text(posting["url"], JOB_MAX_CHARS)
+            except Exception as e:
+                logger.warning(f"Batch posting {posting['index']}: could not fetch {posting['url']}: {e}")
+                return None, ("posting_error", dict(event, error="Could not fetch the job posting", details=str(e)))
+        job_description = budget_inputs("", job_description, model)[1]
+        if not job_description:
+            return None, ("posting_error", dict(event, error="The job posting has no text."))
+        return job_description, None
+    except Exception as e:
+        logger.exception(f"Batch posting {posting['index']} failed")
+        return None, ("posting_error", dict(event, error="Error processing request", details=str(e)))
 
-        # Return PDF as binary response
-        return pdf_bytes, 200, {
-            'Content-Type': 'application/pdf',
-            'Content-Disposition': 'attachment; filename="document.pdf"'
-        }
-    except FileNotFoundError as e:
-        logger.exception("File not found during LaTeX conversion")
-        return jsonify({"error": str(e)}), 404
+# Helper: second stage of a batch posting: generate and optionally compile.
+# Returns the SSE (event, data) to send for it.
+def run_batch_posting(posting, job_description, resume_text, cover_letter, model, structured, compile_pdfs):
+    event = batch_posting_event(posting)
+    try:
+        parsed = run_generation(resume_text, cover_letter, job_description, model, structured)
+        event["result"] = parsed
+        if compile_pdfs:
+            event.update(compile_result_pdfs(parsed))
+        return "posting", event
+    except InvalidModelOutput as e:
+        return "posting_error", dict(event, error="Model output was not valid JSON", raw_output=e.raw_output)
     except Exception as e:
-        logger.exception("Failed to convert LaTeX to PDF")
-        return jsonify({"error": "LaTeX to PDF conversion failed", "details": str(e)}), 500
-    finally:
-        # Clean up temp file
-        if temp_tex_path and os.path.exists(temp_tex_path):
+        logger.exception(f"Batch posting {posting['index']} failed")
+        return "posting_error", dict(event, error="Error processing request", details=str(e))
+
+# Batch variant of /generate: one resume, many postings (URLs or descriptions).
+# Streams a "posting" (or "posting_error") SSE event per posting as soon as it
+# finishes, in completion order, then "done" with the counts.
+@app.route("/generate/batch", methods=["POST"])
+def generate_batch():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    try:
+        resume_text, cover_letter, postings, model = read_batch_inputs()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    structured = wants_structured_output()
+    compile_pdfs = _request_flag("compile")
+
+    def events():
+        fetch_pool = ThreadPoolExecutor(max_workers=min(len(postings), BATCH_FETCH_CONCURRENCY),
+                                        thread_name_prefix="batch-fetch")
+        generate_pool = ThreadPoolExecutor(max_workers=min(len(postings), BATCH_LLM_CONCURRENCY),
+                                           thread_name_prefix="batch")
+        finished = queue.SimpleQueue()
+
+        def generated(future):
+            if not future.cancelled():
+                finished.put(future.result())
+
+        def fetched(posting, future):
+            if future.cancelled():
+                return
+            job_description, error = future.result()
+            if error:
+                finished.put(error)
+                return
             try:
-                os.unlink(temp_tex_path)
-            except:
+                generate_pool.submit(run_batch_posting, posting, job_description, resume_text, cover_letter,
+                                     model, structured, compile_pdfs).add_done_callback(generated)
+            except RuntimeError:
+                # The stream was closed and the pool shut down meanwhile
                 pass
-    
+
+        for posting in postings:
+            fetch_pool.submit(fetch_batch_posting, posting, model).add_done_callback(
+                functools.partial(fetched, posting))
+        counts = {"posting": 0, "posting_error": 0}
+        try:
+            for _ in postings:
+                event, data = finished.get()
+                counts[event] += 1
+                yield sse_event(event, data)
+            yield sse_event("done", {"count": len(postings), "succeeded": counts["posting"],
+                                     "failed": counts["posting_error"]})
+        finally:
+            # Client gone (or done): drop postings that haven't started
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+            generate_pool.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Section edits: regenerate one block of a previous result (a resume section or
+# a cover-letter paragraph) and splice it back in. Only that block goes to the
+# model, and recompiling reuses the precompiled preamble format.
+EDIT_MAX_CHARS = int(os.getenv("EDIT_MAX_CHARS", 8000))
+
+# Helper: validate an edit request body. Returns a dict with the document LaTeX,
+# the previous result (or None) and its key, section, instruction, resume text,
+# job description and model; raises ValueError. args is the query string.
+def parse_edit_request(data, args):
+    document = data.get("document") or "resume"
+    if document not in STRUCTURED_RENDERERS:
+        raise ValueError(f"document must be one of: {', '.join(STRUCTURED_RENDERERS)}")
+    key = STRUCTURED_RENDERERS[document][0]
+    result = data.get("result")
+    if result is not None and not isinstance(result, dict):
+        raise ValueError("result must be the object returned by /generate.")
+    latex_content = data.get("latex") or (result or {}).get(key) or ""
+    if not isinstance(latex_content, str) or not latex_content.strip():
+        raise ValueError(f"Please provide latex or a result with {key}.")
+    section = data.get("section")
+    instruction = (data.get("instruction") or "").strip()
+    if section is None or str(section).strip() == "":
+        raise ValueError("Please provide the section to edit.")
+    if not instruction:
+        raise ValueError("Please provide an instruction.")
+    return {
+        "document": document, "key": key, "result": result, "latex": latex_content,
+        "section": section, "instruction": instruction,
+        "resume_text": data.get("resume", ""), "job_description": data.get("jobDescription", ""),
+        "model": data.get("model") or args.get("model") or MODEL,
+    }
+
+# Helper: chat messages for one section edit. The resume and posting are only
+# sent when the client passed them.
+def build_edit_content(block, instruction, resume_text, job_description):
+    user_content = {"section_title": block.title, "section": block.body, "instruction": instruction}
+    if resume_text:
+        user_content["resume_text"] = resume_text
+    if job_description:
+        user_content["job_description"] = job_description
+    return user_content
+
+def build_edit_messages(user_content):
+    return [
+        {"role": "system", "content": EDIT_SYSTEM_PROMPT},
+        {"role": "user", "content": "Here are the inputs (JSON):\n" + json.dumps(user_content, ensure_ascii=False)}
+    ]
+
+# Helper: model reply to an edit -> {"section": latex}. Raises InvalidModelOutput.
+def finish_edit_reply(reply):
+    parsed = finish_model_reply(reply)
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("section"), str) or not parsed["section"].strip():
+        raise InvalidModelOutput(reply.strip())
+    return {"section": parsed["section"]}
+
+# Helper: new body for block, without a heading the model repeated anyway
+def edited_body(block, parsed):
+    body = parsed["section"].strip()
+    if block.head and body.startswith(block.head.strip()):
+        body = body[len(block.head.strip()):].strip()
+    if block.tail and body.endswith(block.tail):
+        body = body[:-len(block.tail)].strip()
+    return body
+
+# Helper: one section edit through generation_cache and model_hedger (like
+# run_generation). Returns the new body.
+def run_edit(block, instruction, resume_text, job_description, model):
+    user_content = build_edit_content(block, instruction, resume_text, job_description)
+    key = generation_cache_key(model, EDIT_PROMPT_VERSION, user_content)
+    messages = build_edit_messages(user_content)
+
+    def attempt(attempt_model, cancel, deadline):
+        return finish_edit_reply(stream_completion(attempt_model, messages, cancel, deadline))
+
+    def call_model():
+        with spans.span("openai"):
+            parsed, info = model_hedger.call(attempt, model)
+        record_generation_win(info)
+        return parsed
+
+    parsed, source = generation_cache.get_or_compute(key, call_model)
+    if source != "miss":
+        logger.info(f"Generation cache {source} for edit {key[:12]}")
+    return edited_body(block, parsed)
+
+# Helper: the response body for a finished edit. A structured result loses its
+# section data for the edited document, which no longer matches the LaTeX.
+def edit_output(edit, block, latex_content):
+    output = {"latex": latex_content, "section": block.title}
+    if edit["result"] is not None:
+        result = dict(edit["result"])
+        result[edit["key"]] = latex_content
+        result.pop(edit["document"], None)
+        output["result"] = result
+    return output
+
+# Regenerate one section of a previous result and splice it back in.
+# Expects JSON: {"latex" | "result" + "document", "section", "instruction",
+# optional "resume", "jobDescription", "model", "compile"}. Returns the updated
+# "latex" (and "result"), plus a base64 "pdf" when compile is set.
+@app.route("/generate/edit", methods=["POST"])
+def generate_edit():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    try:
+        edit = parse_edit_request(request.get_json(force=True, silent=True) or {}, request.args)
+        block = find_section(edit["latex"], edit["section"])
+    except SectionNotFound as e:
+        return jsonify({"error": str(e), "sections": e.available}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(block.body) > EDIT_MAX_CHARS:
+        return jsonify({"error": f"Section is longer than {EDIT_MAX_CHARS} characters."}), 400
+
+    resume_text, job_description = budget_inputs(edit["resume_text"], edit["job_description"], edit["model"])
+    try:
+        body = run_edit(block, edit["instruction"], resume_text, job_description, edit["model"])
+    except InvalidModelOutput as e:
+        return jsonify({"error": "Model output was not valid JSON", "raw_output": e.raw_output}), 500
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        return jsonify({"error": "The model did not reply in time, please retry.", "details": str(e)}), 504
+    except Exception as e:
+        logger.exception("Error in edit endpoint")
+        return jsonify({"error": "Error processing request", "details": str(e)}), 500
+
+    latex_content = replace_section(edit["latex"], block, body)
+    output = edit_output(edit, block, latex_content)
+    try:
+        if _request_flag("compile"):
+            pdf_bytes, info = compile_latex(latex_content, cancel=client_disconnect_probe(request.environ))
+            output["pdf"] = base64.b64encode(pdf_bytes).decode("ascii")
+            output["pdf_cache"] = info["cache"]
+        else:
+            # Still catch an edit that broke the document
+            prepare_latex(latex_content)
+    except Exception as e:
+        error = compile_error_response(e)
+        return (jsonify(dict(error[0], latex=latex_content)),) + tuple(error[1:])
+    return jsonify(output)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     app.run(host="127.0.0.1", port=port, debug=True)
\ No newline at end of file
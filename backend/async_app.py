@@ -0,0 +1,600 @@
+# Async serving mode: the routes and payloads of app.py on Quart (ASGI), with
+# AsyncOpenAI for the model, httpx for job postings and asyncio subprocesses
+# for pdflatex, so in-flight generations don't each hold a thread.
+# Caches, queues, prompts and metrics are the ones defined in app.py.
+#
+# Run with:  python async_app.py   or   hypercorn async_app:app --bind 127.0.0.1:5000
+
+from quart import Quart, Response, g, jsonify, request
+from quart.wrappers.response import IterableBody
+from openai import AsyncOpenAI
+import httpx
+import asyncio
+import base64
+import logging
+import os
+import time
+
+from app import (
+    BATCH_FETCH_CONCURRENCY, BATCH_LLM_CONCURRENCY, COMPILE_DEADLINE_SECONDS, EDIT_MAX_CHARS,
+    EDIT_PROMPT_VERSION, GENERATION_OUTPUT, JOB_MAX_CHARS, MODEL, OPENAI_API_KEY, RESUME_MAX_CHARS,
+    DeadlineExceeded, InvalidModelOutput, begin_compile, budget_inputs, build_edit_content, build_edit_messages,
+    build_messages, compile_error_response, compile_scheduler, edit_output, edited_body,
+    finish_compile, finish_edit_reply, finish_model_reply, finish_stream_events, generation_cache,
+    generation_jobs, generation_key, metrics, model_hedger, openai_first_token_seconds, openai_requests,
+    page_fetcher, parse_batch_postings, parse_edit_request, pdf_cache, pdf_response_headers,
+    pdf_text_extractor, prepare_latex, record_compile, record_openai_call, record_request,
+    record_generation_win, record_streamed_call, render_structured_part, spans, sse_event,
+    streamed_usage, STREAM_USAGE,
+)
+from json_stream import TopLevelJSONStream
+from latex_sections import SectionNotFound, find_section, replace_section
+from llm_cache import generation_cache_key
+from latex_converter import convert_latex_to_pdf_bytes_async
+from metrics import current_spans
+from page_fetcher import USER_AGENT
+
+# Optional: enable CORS for local frontend (install quart-cors if you need it)
+try:
+    from quart_cors import cors
+    _HAS_CORS = True
+except Exception:
+    _HAS_CORS = False
+
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+if _HAS_CORS:
+    app = cors(app, allow_origin="*")  # allow all origins (OK for local dev)
+
+# Created on the serving loop; AsyncOpenAI and httpx clients are bound to it
+openai_client = None
+hedged_openai_client = None
+stream_openai_client = None
+http_client = None
+
+@app.before_serving
+async def open_clients():
+    global openai_client, hedged_openai_client, stream_openai_client, http_client
+    if OPENAI_API_KEY:
+        openai_client = AsyncOpenAI(api_key = OPENAI_API_KEY)
+    else:
+        openai_client = AsyncOpenAI()
+    # model_hedger does the retrying for run_generation (see app.py)
+    hedged_openai_client = openai_client.with_options(max_retries=0)
+    stream_openai_client = openai_client.with_options(max_retries=model_hedger.retries)
+    pool_size = int(os.getenv("PAGE_FETCH_POOL", 32))
+    http_client = httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+
+@app.after_serving
+async def close_clients():
+    await http_client.aclose()
+    await openai_client.close()
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.spans = []
+    current_spans.set(g.spans)
+
+# Helper: a streamed body that runs on_close once it has been sent (or the
+# client went away), like werkzeug's call_on_close
+class RecordedBody(IterableBody):
+    def __init__(self, body, on_close):
+        super().__init__(body.iter)
+        self.on_close = on_close
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        try:
+            await super().__aexit__(exc_type, exc_value, tb)
+        finally:
+            self.on_close()
+
+# Same Server-Timing header and request metrics as app.py. Streamed bodies are
+# recorded once they have been sent, so SSE and batch latency includes them.
+@app.after_request
+async def add_server_timing(response):
+    timings = g.get("timings") or {}
+    for stage, seconds in g.get("spans") or []:
+        entry = f'{stage.replace("_", "-")};dur={seconds * 1000:.1f}'
+        if stage == "pdf_extract" and "pdf_cache" in timings:
+            entry += f';desc="cache {timings["pdf_cache"]}"'
+        response.headers.add("Server-Timing", entry)
+
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        method, status, path, request_spans = request.method, response.status_code, request.path, g.get("spans") or []
+        if isinstance(response.response, IterableBody):
+            response.response = RecordedBody(
+                response.response, lambda: record_request(route, method, status, path, started, request_spans))
+        else:
+            record_request(route, method, status, path, started, request_spans)
+    return response
+
+@app.route("/", methods=["GET"])
+async def health():
+    return jsonify({"status": "ok", "message": "Backend running", "mode": "async"}), 200
+
+@app.route("/compile-queue/stats", methods=["GET"])
+async def compile_queue_stats():
+    return jsonify(compile_scheduler.stats()), 200
+
+@app.route("/generation-cache/stats", methods=["GET"])
+async def generation_cache_stats():
+    return jsonify(generation_cache.stats()), 200
+
+@app.route("/hedging/stats", methods=["GET"])
+async def hedging_stats():
+    return jsonify(model_hedger.stats()), 200
+
+@app.route("/page-cache/stats", methods=["GET"])
+async def page_cache_stats():
+    return jsonify(page_fetcher.stats()), 200
+
+@app.route("/pdf-text-cache/stats", methods=["GET"])
+async def pdf_text_cache_stats():
+    return jsonify(pdf_text_extractor.stats()), 200
+
+@app.route("/pdf-cache/stats", methods=["GET"])
+async def pdf_cache_stats():
+    return jsonify(pdf_cache.stats()), 200
+
+@app.route("/metrics", methods=["GET"])
+async def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Helper: extract visible text from a job posting URL
+async def extract_text_from_url(url, max_chars=JOB_MAX_CHARS):
+    try:
+        with spans.span("job_fetch"):
+            return await page_fetcher.fetch_text_async(http_client, url, max_chars)
+    except Exception as e:
+        logger.exception("Failed to fetch job posting URL")
+        return f"[unable to fetch/extract job posting text: {str(e)}]"
+
+# Helper: extract text from uploaded PDF. Extraction is CPU bound, so it runs
+# in a worker thread (and big PDFs still fan out to the process pool).
+async def extract_text_from_pdf_bytes(file_bytes, max_chars=8000):
+    try:
+        timings = g.setdefault("timings", {})
+        with spans.span("pdf_extract"):
+            return await asyncio.to_thread(pdf_text_extractor.extract, file_bytes, max_chars, timings=timings)
+    except Exception as e:
+        logger.exception("Failed to extract PDF text")
+        return f"[unable to extract text from PDF: {str(e)}]"
+
+# Helper: raw option from the query string, form or JSON body
+async def _request_option(name):
+    value = request.args.get(name)
+    if value is None:
+        if request.content_type and "multipart/form-data" in request.content_type:
+            value = (await request.form).get(name)
+        else:
+            value = ((await request.get_json(force=True, silent=True)) or {}).get(name)
+    return value
+
+async def _request_flag(name):
+    value = await _request_option(name)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+async def wants_structured_output():
+    return ((await _request_option("output")) or GENERATION_OUTPUT) == "structured"
+
+# Helper: read resume/cover letter/job description from a JSON or multipart request
+async def read_generate_inputs():
+    resume_text = ""
+    cover_letter = ""
+    job_description = ""
+    if request.content_type and "multipart/form-data" in request.content_type:
+        form = await request.form
+        resume_text = form.get("resume", "")
+        cover_letter = form.get("coverLetter", "")
+        job_description = form.get("jobDescription", "")
+        pdf_file = (await request.files).get("resume_pdf")
+        if pdf_file and not resume_text:
+            resume_text = await extract_text_from_pdf_bytes(pdf_file.read(), max_chars=RESUME_MAX_CHARS)
+    else:
+        data = (await request.get_json(force=True, silent=True)) or {}
+        resume_text = data.get("resume", "")
+        cover_letter = data.get("coverLetter", "")
+        job_description = data.get("jobDescription", "")
+
+    model = ((await request.get_json(silent=True)) or {}).get("model") or request.args.get("model") or MODEL
+    resume_text, job_description = await asyncio.to_thread(budget_inputs, resume_text, job_description, model)
+    return resume_text, cover_letter, job_description, model
+
+# Helper: one streamed completion for model_hedger. A losing request's task
+# is cancelled, which closes its stream.
+async def stream_completion(model, messages, deadline):
+    started = time.perf_counter()
+    chunks = []
+    usage = None
+    try:
+        stream = await hedged_openai_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            stream=True,
+            timeout=max(0.1, deadline - time.monotonic()),
+            extra_body=STREAM_USAGE,
+        )
+        async with stream:
+            async for chunk in stream:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Model reply still streaming at the deadline")
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                if not chunks:
+                    openai_first_token_seconds.observe(time.perf_counter() - started, model=model)
+                chunks.append(chunk.choices[0].delta.content or "")
+    except asyncio.CancelledError:
+        openai_requests.inc(model=model, outcome="cancelled")
+        raise
+    except Exception:
+        openai_requests.inc(model=model, outcome="error")
+        raise
+    reply = "".join(chunks)
+    record_openai_call(model, time.perf_counter() - started, streamed_usage(model, messages, reply, usage))
+    return reply
+
+# Helper: one full generation through the shared cache and model_hedger
+async def run_generation(resume_text, cover_letter, job_description, model, structured=False):
+    key = generation_key(resume_text, cover_letter, job_description, model, structured)
+    messages = build_messages(resume_text, cover_letter, job_description, structured)
+
+    async def attempt(attempt_model, deadline):
+        return finish_model_reply(await stream_completion(attempt_model, messages, deadline), structured)
+
+    async def call_model():
+        with spans.span("openai"):
+            parsed, info = await model_hedger.call_async(attempt, model)
+        record_generation_win(info)
+        return parsed
+
+    parsed, source = await generation_cache.get_or_compute_async(key, call_model)
+    if source != "miss":
+        logger.info(f"Generation cache {source} for {key[:12]}")
+    return parsed
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def job_status(job_id):
+    record = generation_jobs.status(job_id)
+    if record is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    return jsonify(record), 200
+
+@app.route("/generate", methods=["POST"])
+async def generate():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    resume_text, cover_letter, job_description, model = await read_generate_inputs()
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    if not job_description:
+        return jsonify({"error": "Please provide a job description."}), 400
+
+    structured = await wants_structured_output()
+
+    if await _request_flag("async"):
+        # Async jobs run on the same worker threads as in app.py
+        job_id = generation_jobs.submit({
+            "resume_text": resume_text,
+            "cover_letter": cover_letter,
+            "job_description": job_description,
+            "model": model,
+            "compile": await _request_flag("compile"),
+            "structured": structured,
+        })
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+    try:
+        parsed = await run_generation(resume_text, cover_letter, job_description, model, structured)
+        return jsonify({"result": parsed})
+    except InvalidModelOutput as e:
+        return jsonify({"error": "Model output was not valid JSON", "raw_output": e.raw_output}), 500
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        return jsonify({"error": "The model did not reply in time, please retry.", "details": str(e)}), 504
+    except Exception as e:
+        logger.exception("Error in generate endpoint")
+        return jsonify({"error": "Error processing request", "details": str(e)}), 500
+
+# Streaming variant of /generate; same events as app.py
+@app.route("/generate/stream", methods=["POST"])
+async def generate_stream():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    resume_text, cover_letter, job_description, model = await read_generate_inputs()
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    if not job_description:
+        return jsonify({"error": "Please provide a job description."}), 400
+
+    structured = await wants_structured_output()
+    messages = build_messages(resume_text, cover_letter, job_description, structured)
+    cache_key = generation_key(resume_text, cover_letter, job_description, model, structured)
+
+    async def events():
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Generation cache hit for {cache_key[:12]}")
+            for key, value in cached.items():
+                yield sse_event(key, value)
+            yield sse_event("done", {"result": cached})
+            return
+
+        parser = TopLevelJSONStream()
+        chunks = []
+        usage = None
+        started = time.perf_counter()
+        deadline = time.monotonic() + model_hedger.deadline
+        try:
+            # Not hedged, for the same reason as in app.py
+            stream = await stream_openai_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.2,
+                stream=True,
+                timeout=model_hedger.deadline,
+                extra_body=STREAM_USAGE,
+            )
+            async for chunk in stream:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Model reply still streaming at the deadline")
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not chunks:
+                    openai_first_token_seconds.observe(time.perf_counter() - started, model=model)
+                chunks.append(delta)
+                for key, value in parser.feed(delta):
+                    if structured:
+                        key, value = render_structured_part(key, value)
+                    yield sse_event(key, value)
+        except Exception as e:
+            logger.exception("Error in generate stream")
+            openai_requests.inc(model=model, outcome="error")
+            yield sse_event("error", {"error": "Error processing request", "details": str(e)})
+            return
+
+        reply = "".join(chunks).strip()
+        record_streamed_call(model, messages, reply, time.perf_counter() - started, usage)
+        for event in finish_stream_events(parser, reply, structured, cache_key):
+            yield event
+
+    response = Response(events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.timeout = None  # the stream lasts as long as the model takes
+    return response
+
+# Helper: compile_latex() from app.py with pdflatex on an asyncio subprocess.
+# A client disconnect cancels the request task, which kills pdflatex. The
+# preflight and the PDF cache (which may read and write its disk tier) run in
+# a worker thread, off the event loop.
+async def compile_latex(latex_content):
+    latex_content, cache_key, cached_pdf, assets = await asyncio.to_thread(begin_compile, latex_content)
+    if cached_pdf is not None:
+        return cached_pdf, {"cache": "hit"}
+
+    compile_stats = {}
+    try:
+        # Includes the wait for a compile slot (see /compile-queue/stats)
+        with spans.span("pdflatex"):
+            pdf_bytes = await compile_scheduler.run_async(
+                convert_latex_to_pdf_bytes_async, latex_content, assets,
+                stats=compile_stats,
+                deadline=time.monotonic() + COMPILE_DEADLINE_SECONDS,
+            )
+    finally:
+        record_compile(compile_stats)
+    return await asyncio.to_thread(finish_compile, cache_key, pdf_bytes, compile_stats)
+
+@app.route("/convert-latex-to-pdf", methods=["POST"])
+async def convert_latex_to_pdf():
+    data = (await request.get_json(force=True, silent=True)) or {}
+    latex_content = data.get("latex_content", "").strip()
+
+    if not latex_content:
+        return jsonify({"error": "Please provide latex_content in the request body."})
+
+    logger.info(f"Received LaTeX content (first 500 chars):\n{latex_content[:500]}")
+
+    try:
+        pdf_bytes, info = await compile_latex(latex_content)
+        return pdf_bytes, 200, pdf_response_headers(info)
+    except Exception as e:
+        return compile_error_response(e)
+
+# Helper: compile the resume and cover letter of a result (see app.py)
+async def compile_result_pdfs(parsed):
+    pdfs = {}
+    pdf_errors = {}
+    for key in ("optimized_resume", "optimized_cover_letter"):
+        latex_content = (parsed.get(key) or "").strip()
+        if not latex_content:
+            continue
+        try:
+            pdf_bytes, _ = await compile_latex(latex_content)
+            pdfs[key] = base64.b64encode(pdf_bytes).decode("ascii")
+        except Exception as e:
+            logger.exception(f"Failed to compile {key}")
+            pdf_errors[key] = str(e)
+    output = {"pdfs": pdfs}
+    if pdf_errors:
+        output["pdf_errors"] = pdf_errors
+    return output
+
+# Helper: the resume, cover letter, postings and options of a batch request
+async def read_batch_inputs():
+    if request.content_type and "multipart/form-data" in request.content_type:
+        data = await request.form
+        resume_text = data.get("resume", "")
+        pdf_file = (await request.files).get("resume_pdf")
+        if pdf_file and not resume_text:
+            resume_text = await extract_text_from_pdf_bytes(pdf_file.read(), max_chars=RESUME_MAX_CHARS)
+    else:
+        data = (await request.get_json(force=True, silent=True)) or {}
+        resume_text = data.get("resume", "")
+    model = data.get("model") or request.args.get("model") or MODEL
+    postings = parse_batch_postings(data.get("postings"))
+    if resume_text:
+        resume_text = (await asyncio.to_thread(budget_inputs, resume_text, "", model))[0]
+    return resume_text, data.get("coverLetter", ""), postings, model
+
+# Helper: one posting of a batch (see fetch_batch_posting and run_batch_posting
+# in app.py). Waiting for a model slot only holds llm_slots, so fetches go on.
+async def run_batch_posting(posting, resume_text, cover_letter, model, structured, compile_pdfs,
+                            fetch_slots, llm_slots):
+    event = {"index": posting["index"], "id": posting["id"]}
+    if posting["url"]:
+        event["url"] = posting["url"]
+    try:
+        job_description = posting["job_description"]
+        if posting["url"]:
+            try:
+                async with fetch_slots:
+                    with spans.span("job_fetch"):
+                        job_description = await page_fetcher.fetch_text_async(
+                            http_client, posting["url"], JOB_MAX_CHARS)
+            except Exception as e:
+                logger.warning(f"Batch posting {posting['index']}: could not fetch {posting['url']}: {e}")
+                return "posting_error", dict(event, error="Could not fetch the job posting", details=str(e))
+        job_description = (await asyncio.to_thread(budget_inputs, "", job_description, model))[1]
+        if not job_description:
+            return "posting_error", dict(event, error="The job posting has no text.")
+        async with llm_slots:
+            parsed = await run_generation(resume_text, cover_letter, job_description, model, structured)
+        event["result"] = parsed
+        if compile_pdfs:
+            event.update(await compile_result_pdfs(parsed))
+        return "posting", event
+    except InvalidModelOutput as e:
+        return "posting_error", dict(event, error="Model output was not valid JSON", raw_output=e.raw_output)
+    except Exception as e:
+        logger.exception(f"Batch posting {posting['index']} failed")
+        return "posting_error", dict(event, error="Error processing request", details=str(e))
+
+# Batch variant of /generate; same events as app.py
+@app.route("/generate/batch", methods=["POST"])
+async def generate_batch():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    try:
+        resume_text, cover_letter, postings, model = await read_batch_inputs()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not resume_text:
+        return jsonify({"error": "Please provide a resume."}), 400
+
+    structured = await wants_structured_output()
+    compile_pdfs = await _request_flag("compile")
+
+    async def events():
+        fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+        llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(run_batch_posting(posting, resume_text, cover_letter, model, structured,
+                                                  compile_pdfs, fetch_slots, llm_slots))
+            for posting in postings
+        ]
+        counts = {"posting": 0, "posting_error": 0}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, data = await next_done
+                counts[event] += 1
+                yield sse_event(event, data)
+            yield sse_event("done", {"count": len(postings), "succeeded": counts["posting"],
+                                     "failed": counts["posting_error"]})
+        finally:
+            # Client gone (or done): stop whatever is still running
+            for task in tasks:
+                task.cancel()
+
+    response = Response(events(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.timeout = None
+    return response
+
+# Helper: one section edit through the shared cache and model_hedger (see app.py)
+async def run_edit(block, instruction, resume_text, job_description, model):
+    user_content = build_edit_content(block, instruction, resume_text, job_description)
+    key = generation_cache_key(model, EDIT_PROMPT_VERSION, user_content)
+    messages = build_edit_messages(user_content)
+
+    async def attempt(attempt_model, deadline):
+        return finish_edit_reply(await stream_completion(attempt_model, messages, deadline))
+
+    async def call_model():
+        with spans.span("openai"):
+            parsed, info = await model_hedger.call_async(attempt, model)
+        record_generation_win(info)
+        return parsed
+
+    parsed, source = await generation_cache.get_or_compute_async(key, call_model)
+    if source != "miss":
+        logger.info(f"Generation cache {source} for edit {key[:12]}")
+    return edited_body(block, parsed)
+
+# Regenerate one section of a previous result; same payload as app.py
+@app.route("/generate/edit", methods=["POST"])
+async def generate_edit():
+    if not OPENAI_API_KEY:
+        return jsonify({"error": "OPENAI_API_KEY is not configured on the server."}), 500
+
+    try:
+        edit = parse_edit_request((await request.get_json(force=True, silent=True)) or {}, request.args)
+        block = find_section(edit["latex"], edit["section"])
+    except SectionNotFound as e:
+        return jsonify({"error": str(e), "sections": e.available}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(block.body) > EDIT_MAX_CHARS:
+        return jsonify({"error": f"Section is longer than {EDIT_MAX_CHARS} characters."}), 400
+
+    resume_text, job_description = await asyncio.to_thread(
+        budget_inputs, edit["resume_text"], edit["job_description"], edit["model"])
+    try:
+        body = await run_edit(block, edit["instruction"], resume_text, job_description, edit["model"])
+    except InvalidModelOutput as e:
+        return jsonify({"error": "Model output was not valid JSON", "raw_output": e.raw_output}), 500
+    except DeadlineExceeded as e:
+        logger.warning(str(e))
+        return jsonify({"error": "The model did not reply in time, please retry.", "details": str(e)}), 504
+    except Exception as e:
+        logger.exception("Error in edit endpoint")
+        return jsonify({"error": "Error processing request", "details": str(e)}), 500
+
+    latex_content = replace_section(edit["latex"], block, body)
+    output = edit_output(edit, block, latex_content)
+    try:
+        if await _request_flag("compile"):
+            pdf_bytes, info = await compile_latex(latex_content)
+            output["pdf"] = base64.b64encode(pdf_bytes).decode("ascii")
+            output["pdf_cache"] = info["cache"]
+        else:
+            await asyncio.to_thread(prepare_latex, latex_content)
+    except Exception as e:
+        error = compile_error_response(e)
+        return (jsonify(dict(error[0], latex=latex_content)),) + tuple(error[1:])
+    return jsonify(output)
+
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", 5000))
+    app.run(host="127.0.0.1", port=port)
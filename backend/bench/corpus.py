@@ -0,0 +1,215 @@
+# Fixture corpus for the benchmarks, built deterministically from the LaTeX
+# sources in the repo (LaTex/*.tex and last_generated.tex):
+#   tex/       the documents themselves, fed to /convert-latex-to-pdf
+#   resumes/   text PDFs of the same resumes (as-is and a 3x long version)
+#   postings/  job-posting HTML pages padded with the usual boilerplate
+#   replies/   model replies (JSON) replayed by the mock OpenAI server
+# Usage: python -m bench.corpus [--out DIR]
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BACKEND_DIR, "bench", "fixtures")
+
+_SOURCES = [
+    os.path.join(BACKEND_DIR, "LaTex", "main.tex"),
+    os.path.join(BACKEND_DIR, "LaTex", "professional_template.tex"),
+    os.path.join(BACKEND_DIR, "last_generated.tex"),
+]
+
+_ROLES = [
+    ("Data Analyst", ["SQL", "Python", "Tableau", "pandas", "A/B testing"]),
+    ("Backend Engineer", ["Python", "Flask", "PostgreSQL", "Docker", "AWS"]),
+    ("Math Tutor", ["lesson planning", "elementary mathematics", "student engagement", "patience"]),
+    ("Machine Learning Intern", ["PyTorch", "scikit-learn", "statistics", "Jupyter", "Git"]),
+]
+
+_BOILERPLATE = [
+    "We use cookies to improve your experience. By continuing you accept our Privacy Policy and Terms of Use.",
+    "Benefits: health, dental and vision insurance, 401(k) matching, paid time off, parental leave and a wellness stipend.",
+    "We are an equal opportunity employer. All qualified applicants will receive consideration without regard to "
+    "race, religion, sexual orientation, gender identity, national origin, disability or protected veteran status.",
+    "Sign in to save job. Share this job. Similar jobs. Create a job alert. Follow us on social media.",
+    "Reasonable accommodation is available on request. Offers are contingent on a background check and E-Verify.",
+]
+
+
+def detex(latex):
+    """Rough LaTeX -> plain text lines, good enough to fill a resume PDF"""
+    _, _, body = latex.partition("\\begin{document}")
+    body = body.split("\\end{document}")[0]
+    body = re.sub(r"(?<!\\)%.*", "", body)
+    body = re.sub(r"\\(begin|end)\{[^}]*\}(\{[^}]*\})*", "\n", body)
+    body = re.sub(r"\\\\|\\newline|\\item", "\n", body)
+    body = re.sub(r"\\[a-zA-Z]+\*?(\[[^\]]*\])?", " ", body)
+    body = re.sub(r"[{}&$]|\\[%&_#$]", lambda m: m.group(0)[-1] if m.group(0).startswith("\\") else " ", body)
+    lines = [re.sub(r"\s+", " ", line).strip() for line in body.split("\n")]
+    return [line for line in lines if len(line) > 2]
+
+
+def _pdf_escape(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(lines, lines_per_page=48):
+    """Minimal multi-page PDF with the lines in Helvetica (no external deps)"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, max(1, len(lines)), lines_per_page)] or [[]]
+    objects = {1: "<< /Type /Catalog /Pages 2 0 R >>", 3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        content = "BT /F1 10 Tf 50 760 Td 14 TL\n" + "".join(f"({_pdf_escape(l)}) Tj T*\n" for l in page_lines) + "ET"
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        objects[content_id] = f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n{objects[obj_id]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    count = max(objects) + 1
+    out += f"xref\n0 {count}\n0000000000 65535 f \n".encode("latin-1")
+    for obj_id in range(1, count):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def posting_html(role, skills, rng, layout):
+    """A job posting page; layout is 'article', 'main' or 'p' like real sites"""
+    relevant = [
+        f"<h2>About the role</h2><p>We are hiring a {role} to join our team. You will work with "
+        f"{', '.join(skills[:3])} every day.</p>",
+        "<h2>Responsibilities</h2><ul>" + "".join(
+            f"<li>Own {s} work end to end and collaborate with the team</li>" for s in skills) + "</ul>",
+        f"<h2>Requirements</h2><p>{rng.randint(1, 5)}+ years of experience with {skills[0]}. "
+        f"Proficiency in {' and '.join(skills[1:3])}. Bachelor's degree in computer science or similar.</p>",
+        f"<h2>Nice to have</h2><p>Familiarity with {skills[-1]} is a plus.</p>",
+    ]
+    noise = rng.sample(_BOILERPLATE, k=len(_BOILERPLATE))
+    nav = "<nav><a href='/'>Home</a> <a href='/jobs'>Jobs</a></nav><script>var tracking = 1;</script>"
+    body = f"<p>{noise[0]}</p>" + "".join(relevant) + "".join(f"<p>{n}</p>" for n in noise[1:])
+    if layout == "article":
+        body = f"<article>{body}</article>"
+    elif layout == "main":
+        body = f"<main>{body}</main>"
+    else:
+        body = re.sub(r"</?(ul|h2)>", "", body).replace("<li>", "<p>").replace("</li>", "</p>")
+    return f"<!doctype html><html><head><title>{role}</title><style>p{{margin:0}}</style></head>" \
+           f"<body>{nav}{body}<footer>All rights reserved.</footer></body></html>"
+
+
+def _reply(resume_tex, cover_tex, skills):
+    return {
+        "resume_suggestions": [f"Highlight experience with {s}" for s in skills[:3]],
+        "optimized_resume": resume_tex,
+        "optimized_cover_letter": cover_tex,
+    }
+
+
+def _structured_reply(lines, role, skills):
+    return {
+        "resume": {
+            "heading": {"name": "Bench Candidate", "phone": "+1 555 0100", "email": "bench@example.com",
+                        "linkedin": "", "github": "", "location": "Vancouver, BC"},
+            "education": [{"school": "University of British Columbia", "dates": "2024 -- Present",
+                           "degree": "BSc Data Science", "location": "Vancouver, BC", "details": lines[:2]}],
+            "experience": [{"title": role, "dates": "2023 -- Present", "company": "Example Co",
+                            "location": "Remote", "bullets": lines[2:7]}],
+            "projects": [{"name": "Benchmark Project", "tech": skills[:3], "dates": "2024",
+                          "bullets": lines[7:9]}],
+            "skills": [{"category": "Languages", "items": skills}],
+            "extra_sections": [],
+        },
+        "cover_letter": {
+            "name": "Bench Candidate", "phone": "+1 555 0100", "email": "bench@example.com",
+            "recipient": "Hiring Manager", "company": "Example Co", "salutation": "Dear Hiring Manager,",
+            "paragraphs": [f"I am excited to apply for the {role} position.", " ".join(lines[9:13]) or role],
+            "closing": "Sincerely,",
+        },
+        "resume_suggestions": [f"Lead with {skills[0]}"],
+    }
+
+
+def build_corpus(out_dir=DEFAULT_DIR, seed=7):
+    """(Re)create the corpus in out_dir. Returns the manifest dict."""
+    rng = random.Random(seed)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    for sub in ("tex", "resumes", "postings", "replies"):
+        os.makedirs(os.path.join(out_dir, sub))
+
+    manifest = {"tex": [], "resumes": [], "postings": [], "replies": [], "structured_replies": []}
+    sources = []
+    for path in _SOURCES:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            latex = f.read()
+        if "\\begin{document}" not in latex:
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        sources.append((name, latex))
+        tex_path = os.path.join("tex", name + ".tex")
+        with open(os.path.join(out_dir, tex_path), "w", encoding="utf-8") as f:
+            f.write(latex)
+        manifest["tex"].append(tex_path)
+
+        lines = detex(latex)
+        if not lines:
+            # Template with an empty body: nothing to put in a resume PDF
+            continue
+        for copies in (1, 3):
+            # A normal resume and a long one that spills over several pages
+            pdf_path = os.path.join("resumes", f"{name}-x{copies}.pdf")
+            with open(os.path.join(out_dir, pdf_path), "wb") as f:
+                f.write(text_pdf(lines * copies))
+            manifest["resumes"].append(pdf_path)
+
+    for i, (role, skills) in enumerate(_ROLES):
+        for layout in ("article", "main", "p"):
+            html_path = os.path.join("postings", f"{i}-{layout}.html")
+            with open(os.path.join(out_dir, html_path), "w", encoding="utf-8") as f:
+                f.write(posting_html(role, skills, rng, layout))
+            manifest["postings"].append(html_path)
+
+        resume_name, resume_tex = sources[i % len(sources)]
+        _, cover_tex = sources[(i + 1) % len(sources)]
+        for kind, reply in (("replies", _reply(resume_tex, cover_tex, skills)),
+                            ("structured_replies", _structured_reply(detex(resume_tex), role, skills))):
+            reply_path = os.path.join("replies", f"{kind}-{i}.json")
+            with open(os.path.join(out_dir, reply_path), "w", encoding="utf-8") as f:
+                json.dump(reply, f, ensure_ascii=False, indent=1)
+            manifest[kind].append(reply_path)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load_corpus(out_dir=DEFAULT_DIR):
+    """Manifest of the corpus in out_dir, building it first if it's missing"""
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return build_corpus(out_dir)
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", default=DEFAULT_DIR)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    manifest = build_corpus(args.out, args.seed)
+    print(json.dumps({k: len(v) for k, v in manifest.items()}))
@@ -0,0 +1,253 @@
+# Stand-in for the OpenAI chat completions API that replays recorded replies.
+# Serves POST /v1/chat/completions (plain and stream=True), and GET
+# /postings/<file> so job-posting URLs can point at the fixture corpus.
+#
+# Replies are matched to a request by a hash of its messages when a recording
+# exists, otherwise they rotate through the corpus replies of the right kind
+# (structured prompt -> structured_replies). Section edits get the section they
+# sent back unchanged. --record URL forwards misses to a
+# real OpenAI-compatible server and saves its replies for later runs.
+#
+# Usage: python -m bench.mock_openai [--port 8765] [--latency 1.5] [--jitter 0.3]
+#        then start the backend with OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.corpus import DEFAULT_DIR, load_corpus
+from prompts import EDIT_SYSTEM_PROMPT, STRUCTURED_SYSTEM_PROMPT
+
+
+def messages_key(messages):
+    return hashlib.sha256(json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(text):
+    return -(-len(text) // 4)
+
+
+class ReplayBook:
+    """Recorded replies by messages hash, plus rotating corpus replies"""
+
+    def __init__(self, corpus_dir=DEFAULT_DIR, record_dir=None):
+        manifest = load_corpus(corpus_dir)
+        self._fallback = {}
+        for kind in ("replies", "structured_replies"):
+            contents = []
+            for path in manifest[kind]:
+                with open(os.path.join(corpus_dir, path), encoding="utf-8") as f:
+                    contents.append(json.dumps(json.load(f), ensure_ascii=False))
+            self._fallback[kind] = itertools.cycle(contents)
+        self.record_dir = record_dir or os.path.join(corpus_dir, "recorded")
+        self._lock = threading.Lock()
+
+    def _recorded_path(self, key):
+        return os.path.join(self.record_dir, key + ".json")
+
+    def lookup(self, messages):
+        path = self._recorded_path(messages_key(messages))
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["content"]
+        system = messages[0]["content"] if messages and messages[0].get("role") == "system" else ""
+        if system == EDIT_SYSTEM_PROMPT:
+            _, _, inputs = messages[-1]["content"].partition("\n")
+            return json.dumps({"section": json.loads(inputs)["section"]}, ensure_ascii=False)
+        kind = "structured_replies" if system == STRUCTURED_SYSTEM_PROMPT else "replies"
+        with self._lock:
+            return next(self._fallback[kind])
+
+    def has_recording(self, messages):
+        return os.path.exists(self._recorded_path(messages_key(messages)))
+
+    def save(self, messages, content):
+        os.makedirs(self.record_dir, exist_ok=True)
+        with open(self._recorded_path(messages_key(messages)), "w", encoding="utf-8") as f:
+            json.dump({"messages": messages, "content": content}, f, ensure_ascii=False, indent=1)
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    latency: seconds before a reply starts (plus up to +/- jitter), like the
+    model's time to first token; model_latency overrides it per model, e.g.
+    {"gpt-4": 3.0, "gpt-3.5-turbo": 0.5} for hedging runs. Streams then send
+    chunk_chars characters every chunk_delay seconds. error_rate makes that
+    fraction of calls 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, book, latency=0.0, jitter=0.0, chunk_chars=40, chunk_delay=0.01,
+                 error_rate=0.0, record_url=None, record_key=None, corpus_dir=DEFAULT_DIR, seed=None,
+                 model_latency=None):
+        super().__init__(address, _Handler)
+        self.book = book
+        self.latency = latency
+        self.model_latency = model_latency or {}
+        self.jitter = jitter
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.record_url = record_url
+        self.record_key = record_key
+        self.corpus_dir = corpus_dir
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self, model=None):
+        with self._lock:
+            self.calls += 1
+            jitter = self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+            failed = self.rng.random() < self.error_rate
+        time.sleep(max(0.0, self.model_latency.get(model, self.latency) + jitter))
+        return failed
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/postings/"):
+            name = os.path.basename(self.path)
+            path = os.path.join(self.server.corpus_dir, "postings", name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return self._send(200, f.read(), "text/html; charset=utf-8")
+        self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, b'{"error": {"message": "not found"}}')
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4")
+
+        if self.server.delay(model):
+            return self._send(500, b'{"error": {"message": "injected failure", "type": "server_error"}}')
+
+        server = self.server
+        if server.record_url and not server.book.has_recording(messages):
+            content = self._forward(dict(body, stream=False))
+            server.book.save(messages, content)
+        else:
+            content = server.book.lookup(messages)
+
+        completion_id = "chatcmpl-bench-" + hashlib.sha1(os.urandom(8)).hexdigest()[:12]
+        created = int(time.time())
+        if not body.get("stream"):
+            prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+            completion_tokens = _estimate_tokens(content)
+            reply = {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+            return self._send(200, json.dumps(reply).encode("utf-8"))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            chunk({"role": "assistant", "content": ""})
+            step = max(1, server.chunk_chars)
+            for i in range(0, len(content), step):
+                chunk({"content": content[i:i + step]})
+                if server.chunk_delay:
+                    time.sleep(server.chunk_delay)
+            chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+                completion_tokens = _estimate_tokens(content)
+                usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [],
+                         "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                                   "total_tokens": prompt_tokens + completion_tokens}}
+                self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _forward(self, body):
+        request = urllib.request.Request(
+            self.server.record_url.rstrip("/") + "/chat/completions",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.server.record_key}"},
+        )
+        with urllib.request.urlopen(request, timeout=300) as resp:
+            return json.load(resp)["choices"][0]["message"]["content"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", default=DEFAULT_DIR)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds before each reply starts")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="latency for one model (repeatable), e.g. gpt-4=3 gpt-3.5-turbo=0.5")
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--record", metavar="URL", help="forward unrecorded requests to this API base and save replies")
+    args = parser.parse_args()
+    model_latency = {}
+    for item in args.model_latency:
+        model, _, seconds = item.partition("=")
+        model_latency[model] = float(seconds)
+
+    server = MockOpenAIServer(
+        (args.host, args.port), ReplayBook(args.corpus), latency=args.latency, jitter=args.jitter,
+        chunk_chars=args.chunk_chars, chunk_delay=args.chunk_delay, error_rate=args.error_rate,
+        record_url=args.record, record_key=os.getenv("OPENAI_API_KEY"), corpus_dir=args.corpus,
+        model_latency=model_latency,
+    )
+    print(f"Mock OpenAI server on {server.url}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
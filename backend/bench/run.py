@@ -0,0 +1,353 @@
+# Load scenarios against the backend with the mock OpenAI server standing in
+# for the API. Each scenario runs at every concurrency level as a closed loop
+# (N clients, each sending its next request as soon as the last one returns)
+# and reports p50/p95/p99 latency, requests per second and errors as JSON.
+#
+# Scenarios:
+#   generate         multipart POST /generate (resume PDF upload, like the frontend)
+#   generate_stream  POST /generate/stream, read to the final event (also time to first event)
+#   convert          POST /convert-latex-to-pdf with the corpus .tex files
+#   e2e              /generate, then compile the resume and the cover letter
+#   edit             POST /generate/edit on one section of a corpus resume, compiled
+#
+# Inputs get a per-request nonce so the generation and PDF caches miss; pass
+# --warm to measure the cached path instead.
+#
+# Usage (from backend/):
+#   python -m bench.run --concurrency 1,4,16 --requests 50 --output bench/results/run.json
+#   python -m bench.run --compare bench/results/before.json bench/results/run.json
+#   HEDGE_DELAY_SECONDS=1 HEDGE_MODEL=gpt-3.5-turbo python -m bench.run --scenarios generate \
+#       --jitter 2 --model-latency gpt-4=2 --model-latency gpt-3.5-turbo=0.3
+# By default the app is served in-process on a free port; --target URL benchmarks
+# a server that is already running (start it with OPENAI_BASE_URL pointing at
+# the mock, see bench/mock_openai.py).
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.corpus import DEFAULT_DIR, detex, load_corpus
+from bench.mock_openai import MockOpenAIServer, ReplayBook
+from latex_sections import list_sections
+
+SCENARIOS = ("generate", "generate_stream", "convert", "e2e", "edit")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Corpus:
+    def __init__(self, corpus_dir):
+        from page_fetcher import extract_visible_text
+
+        manifest = load_corpus(corpus_dir)
+        self.tex = [self._read(corpus_dir, p, "r") for p in manifest["tex"]]
+        self.resumes = [self._read(corpus_dir, p, "rb") for p in manifest["resumes"]]
+        self.resume_texts = [text for text in ("\n".join(detex(tex)) for tex in self.tex) if text]
+        self.sectioned = [(tex, sections[-1]) for tex, sections in ((tex, list_sections(tex)) for tex in self.tex)
+                          if sections]
+        # Job descriptions as a user would paste them: the page text, boilerplate included
+        self.postings = [extract_visible_text(self._read(corpus_dir, p, "r"), 20000) for p in manifest["postings"]]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(corpus_dir, path, mode):
+        with open(os.path.join(corpus_dir, path), mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            return f.read()
+
+    def next_index(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+
+class Client:
+    """One benchmark client: a session plus the request builders"""
+
+    def __init__(self, base_url, corpus, warm=False, structured=False, timeout=300):
+        self.base_url = base_url.rstrip("/")
+        self.corpus = corpus
+        self.warm = warm
+        self.structured = structured
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _nonce(self):
+        return "" if self.warm else uuid.uuid4().hex
+
+    def generate(self):
+        i = self.corpus.next_index()
+        nonce = self._nonce()
+        data = {"jobDescription": self.corpus.postings[i % len(self.corpus.postings)] + (f"\nRef {nonce}" if nonce else ""),
+                "coverLetter": ""}
+        if self.structured:
+            data["output"] = "structured"
+        files = {"resume_pdf": ("resume.pdf", self.corpus.resumes[i % len(self.corpus.resumes)], "application/pdf")}
+        resp = self.session.post(f"{self.base_url}/generate", data=data, files=files, timeout=self.timeout)
+        return resp.status_code, (resp.json() if resp.status_code == 200 else None), {}
+
+    def generate_stream(self):
+        i = self.corpus.next_index()
+        nonce = self._nonce()
+        payload = {"resume": self.corpus.resume_texts[i % len(self.corpus.resume_texts)] + (f"\n{nonce}" if nonce else ""),
+                   "jobDescription": self.corpus.postings[i % len(self.corpus.postings)]}
+        if self.structured:
+            payload["output"] = "structured"
+        started = time.perf_counter()
+        first_event = None
+        status = None
+        with self.session.post(f"{self.base_url}/generate/stream", json=payload, stream=True,
+                               timeout=self.timeout) as resp:
+            status = resp.status_code
+            for line in resp.iter_lines():
+                if first_event is None and line.startswith(b"event:"):
+                    first_event = time.perf_counter() - started
+                if line == b"event: error":
+                    status = 502
+        return status, None, {"first_event": first_event}
+
+    def convert(self, latex=None):
+        if latex is None:
+            latex = self.corpus.tex[self.corpus.next_index() % len(self.corpus.tex)]
+        nonce = self._nonce()
+        if nonce:
+            latex = latex.replace("\\begin{document}", f"\\begin{{document}}\n% bench {nonce}", 1)
+        resp = self.session.post(f"{self.base_url}/convert-latex-to-pdf", json={"latex_content": latex},
+                                 timeout=self.timeout)
+        return resp.status_code, None, {"pdf_cache": resp.headers.get("X-PDF-Cache")}
+
+    def e2e(self):
+        status, body, _ = self.generate()
+        if status != 200:
+            return status, None, {}
+        result = body["result"]
+        for key in ("optimized_resume", "optimized_cover_letter"):
+            if result.get(key):
+                status, _, _ = self.convert(result[key])
+                if status != 200:
+                    return status, None, {}
+        return 200, None, {}
+
+    def edit(self):
+        latex, section = self.corpus.sectioned[self.corpus.next_index() % len(self.corpus.sectioned)]
+        nonce = self._nonce()
+        payload = {"latex": latex, "section": section, "compile": True,
+                   "instruction": "Tighten the wording" + (f" ({nonce})" if nonce else "")}
+        resp = self.session.post(f"{self.base_url}/generate/edit", json=payload, timeout=self.timeout)
+        return resp.status_code, None, {"pdf_cache": resp.json().get("pdf_cache") if resp.status_code == 200 else None}
+
+
+def run_scenario(name, base_url, corpus, concurrency, total, warm=False, structured=False):
+    latencies = []
+    first_events = []
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        client = Client(base_url, corpus, warm=warm, structured=structured)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status, _, extra = getattr(client, name)()
+            except Exception as e:
+                status, extra = "exception", {}
+                with lock:
+                    if len(errors) < 5:
+                        errors.append(repr(e))
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if extra.get("first_event") is not None:
+                    first_events.append(extra["first_event"])
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    first_events.sort()
+    ok = statuses.get("200", 0)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    summary = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "ok": ok,
+        "error_rate": round(1 - ok / len(latencies), 4) if latencies else 0.0,
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 3) if wall else None,
+        "ok_rps": round(ok / wall, 3) if wall else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+    }
+    if first_events:
+        summary["first_event_ms"] = {"p50": ms(percentile(first_events, 50)), "p95": ms(percentile(first_events, 95)),
+                                     "p99": ms(percentile(first_events, 99))}
+    if errors:
+        summary["sample_errors"] = errors
+    return summary
+
+
+def serve_app_in_process(mock_url):
+    """Import the app against the mock API and serve it on a free port. Returns the base URL."""
+    os.environ["OPENAI_BASE_URL"] = mock_url + "/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    from werkzeug.serving import make_server
+    import app as backend
+
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _server_stats(base_url):
+    stats = {}
+    for name in ("generation-cache", "pdf-cache", "pdf-text-cache", "compile-queue", "hedging"):
+        try:
+            stats[name] = requests.get(f"{base_url}/{name}/stats", timeout=5).json()
+        except Exception:
+            pass
+    return stats
+
+
+def compare(before_path, after_path):
+    """Print p50/p95/p99 and rps changes per scenario and concurrency"""
+    with open(before_path) as f:
+        before = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+
+    def delta(old, new):
+        if old in (None, 0) or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"{'scenario':<16}{'conc':>5}  {'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}")
+    for r in after:
+        old = before.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        print(f"{r['scenario']:<16}{r['concurrency']:>5}  "
+              + "".join(f"{delta(old['latency_ms'][p], r['latency_ms'][p]):>10}" for p in ("p50", "p95", "p99"))
+              + f"{delta(old['rps'], r['rps']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks for the backend")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated client counts")
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="mock latency for one model (repeatable); pair with HEDGE_DELAY_SECONDS/HEDGE_MODEL")
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--corpus", default=DEFAULT_DIR)
+    parser.add_argument("--target", help="benchmark an already running server instead of an in-process one")
+    parser.add_argument("--warm", action="store_true", help="repeat identical inputs so caches hit")
+    parser.add_argument("--structured", action="store_true", help="request structured output")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    model_latency = {}
+    for item in args.model_latency:
+        model, _, seconds = item.partition("=")
+        model_latency[model] = float(seconds)
+
+    mock = MockOpenAIServer(("127.0.0.1", 0), ReplayBook(args.corpus), latency=args.latency, jitter=args.jitter,
+                            chunk_delay=args.chunk_delay, error_rate=args.error_rate, corpus_dir=args.corpus, seed=0,
+                            model_latency=model_latency)
+    mock.start()
+    base_url = args.target or serve_app_in_process(mock.url)
+    corpus = Corpus(args.corpus)
+
+    results = []
+    for name in scenarios:
+        for level in levels:
+            summary = run_scenario(name, base_url, corpus, level, args.requests, args.warm, args.structured)
+            results.append(summary)
+            lat = summary["latency_ms"]
+            print(f"{name:<16} c={level:<3} p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                  f"rps={summary['rps']} ok={summary['ok']}/{summary['requests']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "target": args.target or "in-process",
+            "mock": {"latency": args.latency, "jitter": args.jitter, "chunk_delay": args.chunk_delay,
+                     "error_rate": args.error_rate, "model_latency": model_latency, "calls": mock.calls},
+            "requests_per_level": args.requests,
+            "warm": args.warm,
+            "structured": args.structured,
+        },
+        "results": results,
+        "server_stats": _server_stats(base_url),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import collections
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the wait queue is full; retry_after is a hint in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Compile queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued caller: a thread blocked on event, or a coroutine awaiting future"""
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+    def grant(self):
+        # Caller holds the scheduler lock. False if the waiter's loop is gone.
+        if self.event is not None:
+            self.event.set()
+        else:
+            try:
+                self.loop.call_soon_threadsafe(_wake, self.future)
+            except RuntimeError:
+                return False
+        self.granted = True
+        return True
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CompileScheduler:
+    """
+    Admission control for pdflatex.
+    At most `workers` compiles run at once (one pdflatex process each); up to
+    `max_queue` more callers wait for a slot, anything beyond that is shed
+    with QueueFull. Waiting threads (run) and coroutines (run_async) share one
+    first-come-first-served queue; a freed slot goes straight to the oldest.
+    Each call carries its own deadline, which covers both the wait and the
+    compile itself.
+    """
+
+    def __init__(self, workers=None, max_queue=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self._free = self.workers
+        self._queue = collections.deque()   # _Waiter, oldest first
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _retry_after(self):
+        # Caller holds the lock. Rough time for the queue ahead to drain.
+        avg_run = (self.total_run / self.completed) if self.completed else 2.0
+        return max(1, math.ceil(avg_run * (self._waiting + self._running) / self.workers))
+
+    def _try_start(self):
+        # A free slot, unless someone is already queued for it
+        with self._lock:
+            if self._free and not self._queue:
+                self._free -= 1
+                self.waits += 1
+                self._running += 1
+                return True
+            return False
+
+    def _enqueue(self, waiter):
+        # Only for callers that have to wait: max_queue bounds the queue, not
+        # the callers an idle worker could take right away
+        with self._lock:
+            if self._free and not self._queue:
+                # A slot freed up since _try_start()
+                self._free -= 1
+                waiter.granted = True
+            elif self._waiting >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(self._retry_after())
+            else:
+                self._queue.append(waiter)
+            self._waiting += 1
+
+    def _dequeue(self, waiter, waited):
+        # After the wait, granted or not. Returns whether it got the slot.
+        with self._lock:
+            acquired = waiter.granted
+            if not acquired:
+                self._queue.remove(waiter)
+            self._waiting -= 1
+            self.waits += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if acquired:
+                self._running += 1
+            else:
+                self.timed_out += 1
+            return acquired
+
+    def _release(self):
+        with self._lock:
+            while self._queue:
+                if self._queue.popleft().grant():
+                    return
+            self._free += 1
+
+    def _pass_on(self):
+        # A granted slot its waiter no longer wants
+        with self._lock:
+            self._running -= 1
+        self._release()
+
+    def _finished(self, elapsed):
+        with self._lock:
+            self._running -= 1
+            self.completed += 1
+            self.total_run += elapsed
+        self._release()
+
+    def run(self, fn, *args, deadline=None, **kwargs):
+        """
+        Run fn(*args, deadline=deadline, **kwargs) once a slot is free.
+        Raises QueueFull if too many callers are waiting and TimeoutError if
+        the deadline passes before a slot frees up.
+        """
+        if not self._try_start():
+            waiter = _Waiter(event=threading.Event())
+            self._enqueue(waiter)
+            enqueued = time.monotonic()
+            timeout = None if deadline is None else max(0.0, deadline - enqueued)
+            if not waiter.granted:
+                waiter.event.wait(timeout)
+            if not self._dequeue(waiter, time.monotonic() - enqueued):
+                raise TimeoutError("Timed out waiting for a free compile worker")
+
+        started = time.monotonic()
+        try:
+            return fn(*args, deadline=deadline, **kwargs)
+        finally:
+            self._finished(time.monotonic() - started)
+
+    async def run_async(self, fn, *args, deadline=None, **kwargs):
+        """
+        run() for the async server: awaits fn(*args, deadline=deadline, **kwargs)
+        once a slot is free, without blocking a thread while it waits. It
+        queues behind run() callers (async jobs on worker threads) in the same
+        order and shares their `workers` slots.
+        """
+        if not self._try_start():
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._enqueue(waiter)
+            enqueued = time.monotonic()
+            timeout = None if deadline is None else max(0.0, deadline - enqueued)
+            try:
+                if not waiter.granted:
+                    await asyncio.wait({waiter.future}, timeout=timeout)
+            except asyncio.CancelledError:
+                # Cancelled while queued: a slot granted meanwhile goes to the next
+                if self._dequeue(waiter, time.monotonic() - enqueued):
+                    self._pass_on()
+                raise
+            if not self._dequeue(waiter, time.monotonic() - enqueued):
+                raise TimeoutError("Timed out waiting for a free compile worker")
+
+        started = time.monotonic()
+        try:
+            return await fn(*args, deadline=deadline, **kwargs)
+        finally:
+            self._finished(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._waiting,
+                "running": self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_seconds": (self.total_wait / self.waits) if self.waits else 0.0,
+                "max_wait_seconds": self.max_wait,
+                "avg_run_seconds": (self.total_run / self.completed) if self.completed else 0.0,
+            }
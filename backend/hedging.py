@@ -0,0 +1,257 @@
+# Hedged and fallback model calls for run_generation. The primary request goes
+# out first; if it hasn't replied after `delay` seconds, or it fails, a second
+# request goes to `hedge_model` (a faster model, or the same one). The first
+# valid reply wins and the other request is cancelled. Each request retries
+# transient API errors with exponential backoff, all within one deadline.
+
+import asyncio
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptCancelled(Exception):
+    """Raised inside a request whose result is no longer wanted"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """No request produced a valid reply before the deadline"""
+
+    def __init__(self, deadline):
+        super().__init__(f"No model reply within {deadline:g}s")
+        self.deadline = deadline
+
+
+def is_transient(error):
+    """Errors worth retrying: connection problems, timeouts, 429 and 5xx"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+
+class ModelHedger:
+    """
+    delay: seconds before the hedge request starts alongside the primary
+    (0: only as a fallback once the primary has failed). hedge_model: model
+    for the hedge request; None uses the primary's model, and with no delay
+    and no hedge_model there is no second request at all.
+    retries/backoff: extra tries per request for transient errors, waiting
+    backoff * 2^n seconds (with jitter) between them. deadline: seconds for
+    the whole call, retries and hedge included.
+
+    call(attempt, model) runs attempt(model, cancel, deadline) on worker
+    threads: one request, returning the parsed reply. It should check the
+    cancel Event while the reply streams in and raise AttemptCancelled;
+    deadline is a time.monotonic() value. call_async() takes a coroutine
+    function attempt(model, deadline), which is cancelled like any task.
+    """
+
+    def __init__(self, delay=0.0, hedge_model=None, retries=2, backoff=0.5, deadline=120.0):
+        self.delay = delay
+        self.hedge_model = hedge_model
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.wins = {"primary": 0, "hedge": 0}
+        self.hedged = 0
+        self.fallbacks = 0
+        self.retried = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    @property
+    def enabled(self):
+        return self.delay > 0 or bool(self.hedge_model)
+
+    def _paths(self, model):
+        paths = [("primary", model)]
+        if self.enabled:
+            paths.append(("hedge", self.hedge_model or model))
+        return paths
+
+    def _count(self, name, path=None):
+        with self._lock:
+            if name == "wins":
+                self.wins[path] += 1
+            else:
+                setattr(self, name, getattr(self, name) + 1)
+
+    def _pause(self, retry):
+        return self.backoff * (2 ** retry) * random.uniform(0.5, 1.5)
+
+    def _should_retry(self, error, retry, deadline, path, model):
+        # Returns the pause before the next try, or None to give up
+        if not is_transient(error) or retry >= self.retries:
+            return None
+        pause = self._pause(retry)
+        if time.monotonic() + pause >= deadline:
+            return None
+        self._count("retried")
+        logger.warning(f"Model request ({path}, {model}) failed with {type(error).__name__}, "
+                       f"retrying in {pause:.2f}s: {error}")
+        return pause
+
+    def _with_retries(self, attempt, path, model, cancel, deadline):
+        for retry in itertools.count():
+            try:
+                return attempt(model, cancel, deadline)
+            except AttemptCancelled:
+                raise
+            except Exception as e:
+                pause = None if cancel.is_set() else self._should_retry(e, retry, deadline, path, model)
+                if pause is None:
+                    raise
+            if cancel.wait(pause):
+                raise AttemptCancelled()
+
+    async def _with_retries_async(self, attempt, path, model, deadline):
+        for retry in itertools.count():
+            try:
+                return await attempt(model, deadline)
+            except Exception as e:
+                pause = self._should_retry(e, retry, deadline, path, model)
+                if pause is None:
+                    raise
+            await asyncio.sleep(pause)
+
+    def _next_wait(self, started, deadline, hedge_pending):
+        # Seconds until something is due: the hedge, else the deadline
+        now = time.monotonic()
+        wait = deadline - now
+        if hedge_pending:
+            wait = min(wait, started + self.delay - now) if self.delay > 0 else wait
+        return wait
+
+    def _won(self, path, model, started):
+        self._count("wins", path)
+        return {"path": path, "model": model, "seconds": time.monotonic() - started}
+
+    def _failed(self, errors):
+        self._count("failed")
+        errors.sort(key=lambda error: error[0] != "primary")
+        for path, model, error in errors[1:]:
+            logger.warning(f"Model request ({path}, {model}) also failed: {error}")
+        raise errors[0][2]
+
+    def call(self, attempt, model):
+        """
+        Returns (result, info) where info has the winning "path" ("primary"
+        or "hedge"), its "model" and "seconds". Raises the primary's error if
+        every request fails and DeadlineExceeded if none replies in time.
+        """
+        self._count("calls")
+        started = time.monotonic()
+        deadline = started + self.deadline
+        cancel = threading.Event()
+        finished = queue.SimpleQueue()
+        paths = self._paths(model)
+        launched = 0
+        running = 0
+        errors = []
+
+        def run_path(path, path_model):
+            try:
+                finished.put((path, path_model, self._with_retries(attempt, path, path_model, cancel, deadline), None))
+            except Exception as e:
+                finished.put((path, path_model, None, e))
+
+        def launch():
+            nonlocal launched, running
+            path, path_model = paths[launched]
+            threading.Thread(target=run_path, args=(path, path_model), daemon=True,
+                             name=f"openai-{path}").start()
+            launched += 1
+            running += 1
+
+        launch()
+        try:
+            while running:
+                hedge_pending = launched < len(paths)
+                wait = self._next_wait(started, deadline, hedge_pending)
+                if wait <= 0:
+                    if time.monotonic() >= deadline:
+                        self._count("timed_out")
+                        raise DeadlineExceeded(self.deadline)
+                    self._count("hedged")
+                    launch()
+                    continue
+                try:
+                    path, path_model, result, error = finished.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                running -= 1
+                if error is None:
+                    return result, self._won(path, path_model, started)
+                errors.append((path, path_model, error))
+                if launched < len(paths):
+                    self._count("fallbacks")
+                    launch()
+            self._failed(errors)
+        finally:
+            cancel.set()
+
+    async def call_async(self, attempt, model):
+        """call() for the async server: same result, info and errors"""
+        self._count("calls")
+        started = time.monotonic()
+        deadline = started + self.deadline
+        paths = self._paths(model)
+        tasks = {}
+        errors = []
+
+        def launch():
+            path, path_model = paths[len(tasks) + len(errors)]
+            task = asyncio.ensure_future(self._with_retries_async(attempt, path, path_model, deadline))
+            tasks[task] = (path, path_model)
+
+        launch()
+        try:
+            while tasks:
+                hedge_pending = len(tasks) + len(errors) < len(paths)
+                wait = self._next_wait(started, deadline, hedge_pending)
+                if wait <= 0:
+                    if time.monotonic() >= deadline:
+                        self._count("timed_out")
+                        raise DeadlineExceeded(self.deadline)
+                    self._count("hedged")
+                    launch()
+                    continue
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    path, path_model = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result(), self._won(path, path_model, started)
+                    errors.append((path, path_model, task.exception()))
+                if errors and not tasks and len(errors) < len(paths):
+                    self._count("fallbacks")
+                    launch()
+            self._failed(errors)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "delay_seconds": self.delay,
+                "hedge_model": self.hedge_model,
+                "retries": self.retries,
+                "deadline_seconds": self.deadline,
+                "calls": self.calls,
+                "wins": dict(self.wins),
+                "hedged": self.hedged,
+                "fallbacks": self.fallbacks,
+                "retried": self.retried,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+            }
@@ -0,0 +1,294 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class InProcessBroker:
+    """Jobs and results live in this process (queue.Queue + dict)"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def put(self, job_id, payload, record):
+        with self._lock:
+            self._records[job_id] = dict(record)
+        self._queue.put((job_id, payload))
+
+    def take(self, timeout):
+        try:
+            job_id, payload = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.update(job_id, status=RUNNING, started_at=time.time())
+        return job_id, payload
+
+    def renew(self, job_ids):
+        # Jobs can't outlive this process, so there are no leases to extend
+        pass
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._records:
+                self._records[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._records.get(job_id)
+            return dict(record) if record else None
+
+    def purge(self, now):
+        with self._lock:
+            expired = [k for k, r in self._records.items() if r.get("expires_at") and r["expires_at"] <= now]
+            for k in expired:
+                del self._records[k]
+        return len(expired)
+
+    def depth(self):
+        return self._queue.qsize()
+
+
+class SQLiteBroker:
+    """
+    Local stand-in for an external broker: jobs and results are rows in a
+    SQLite file, so several server processes can share one queue.
+    A claimed job holds a lease of lease_seconds that its worker renews while
+    it runs. A job whose lease ran out (its process died) is queued again on
+    the next take(), or failed once it has been claimed max_attempts times;
+    failed records are kept result_ttl seconds.
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=2, result_ttl=3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, payload TEXT, status TEXT, record TEXT,"
+                " created REAL, expires REAL, lease REAL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "lease" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, job_id, payload, record):
+        self._conn().execute(
+            "INSERT INTO jobs (id, payload, status, record, created, expires) VALUES (?, ?, ?, ?, ?, NULL)",
+            (job_id, json.dumps(payload), QUEUED, json.dumps(record), time.time()),
+        )
+
+    def _reclaim(self, conn, now):
+        # Caller is in a transaction. Running jobs whose worker stopped renewing.
+        expired = conn.execute(
+            "SELECT id, record FROM jobs WHERE status = ? AND (lease IS NULL OR lease <= ?)", (RUNNING, now)
+        ).fetchall()
+        for job_id, record in expired:
+            record = json.loads(record)
+            if record.get("attempts", 1) < self.max_attempts:
+                logger.warning(f"Job {job_id} lost its worker, queueing it again")
+                record["status"] = QUEUED
+                expires = None
+            else:
+                logger.warning(f"Job {job_id} lost its worker {record.get('attempts', 1)} times, failing it")
+                record.update(status=FAILED, error="The worker running this job stopped",
+                              finished_at=now, expires_at=now + self.result_ttl)
+                expires = record["expires_at"]
+            conn.execute(
+                "UPDATE jobs SET record = ?, status = ?, expires = ?, lease = NULL WHERE id = ?",
+                (json.dumps(record), record["status"], expires, job_id),
+            )
+
+    def take(self, timeout):
+        deadline = time.monotonic() + timeout
+        conn = self._conn()
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reclaim(conn, now)
+                row = conn.execute(
+                    "SELECT id, payload, record FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row:
+                    record = json.loads(row[2])
+                    record.update(status=RUNNING, started_at=now, attempts=record.get("attempts", 0) + 1)
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, record = ?, lease = ? WHERE id = ?",
+                        (RUNNING, json.dumps(record), now + self.lease_seconds, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if row:
+                return row[0], json.loads(row[1])
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+
+    def renew(self, job_ids):
+        """Extend the leases of jobs this process is still running"""
+        if not job_ids:
+            return
+        lease = time.time() + self.lease_seconds
+        self._conn().executemany(
+            "UPDATE jobs SET lease = ? WHERE id = ? AND status = ?",
+            [(lease, job_id, RUNNING) for job_id in job_ids],
+        )
+
+    def update(self, job_id, **fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row:
+                record = json.loads(row[0])
+                record.update(fields)
+                conn.execute(
+                    "UPDATE jobs SET record = ?, status = ?, expires = ? WHERE id = ?",
+                    (json.dumps(record), record["status"], record.get("expires_at"), job_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, now):
+        cur = self._conn().execute("DELETE FROM jobs WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        return cur.rowcount
+
+    def depth(self):
+        row = self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+        return row[0]
+
+
+def make_broker(url, **options):
+    """
+    'memory' (default) or 'sqlite:///path/to/jobs.db'. options go to
+    SQLiteBroker (lease_seconds, max_attempts, result_ttl).
+    """
+    if not url or url == "memory":
+        return InProcessBroker()
+    if url.startswith("sqlite:///"):
+        return SQLiteBroker(url[len("sqlite:///"):], **options)
+    raise ValueError(f"Unsupported job broker: {url}")
+
+
+class JobQueue:
+    """
+    Runs handler(payload) on a pool of worker threads. Callers get a job id
+    back immediately and poll status(); finished jobs are kept for result_ttl
+    seconds. Workers start on the first submit().
+    """
+
+    def __init__(self, handler, broker=None, workers=4, result_ttl=3600):
+        self.handler = handler
+        self.broker = broker or InProcessBroker()
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._threads = []
+        self._running = set()   # job ids this process is working on
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout)
+
+    def submit(self, payload):
+        self.start()
+        job_id = uuid.uuid4().hex
+        record = {"job_id": job_id, "status": QUEUED, "created_at": time.time()}
+        self.broker.put(job_id, payload, record)
+        return job_id
+
+    def status(self, job_id):
+        record = self.broker.get(job_id)
+        if record and record.get("expires_at") and record["expires_at"] <= time.time():
+            return None
+        return record
+
+    def depth(self):
+        return self.broker.depth()
+
+    def _work(self):
+        last_purge = 0.0
+        while not self._stopping.is_set():
+            now = time.time()
+            if now - last_purge > 60:
+                self.broker.purge(now)
+                last_purge = now
+
+            item = self.broker.take(timeout=0.5)
+            if item is None:
+                continue
+            job_id, payload = item
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                result = self.handler(payload)
+                fields = {"status": DONE, "result": result}
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed")
+                fields = {"status": FAILED, "error": str(e)}
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+            finished = time.time()
+            self.broker.update(job_id, finished_at=finished, expires_at=finished + self.result_ttl, **fields)
+
+    def _heartbeat(self):
+        # Keeps the broker's leases on running jobs (see SQLiteBroker)
+        interval = max(0.1, getattr(self.broker, "lease_seconds", 60) / 3)
+        while not self._stopping.wait(interval):
+            with self._lock:
+                running = list(self._running)
+            try:
+                self.broker.renew(running)
+            except Exception:
+                logger.exception("Could not renew job leases")
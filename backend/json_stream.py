@@ -0,0 +1,86 @@
+import json
+
+
+class TopLevelJSONStream:
+    """
+    Incremental parser for a streamed JSON object.
+    feed() takes text chunks as they arrive and returns the (key, value) pairs
+    whose values finished in that chunk, so callers can act on each top-level
+    key without waiting for the whole object. Text before the opening brace
+    (commentary, ```json fences) is skipped.
+    """
+
+    def __init__(self):
+        self._pos = 0           # absolute offset of the next char to scan
+        self._text = ""
+        self._started = False
+        self._done = False
+        self._failed = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self._value_start = None
+        self.completed = {}
+
+    @property
+    def done(self):
+        return self._done
+
+    def feed(self, chunk):
+        finished = []
+        if self._done or self._failed or not chunk:
+            return finished
+        self._text += chunk
+
+        text = self._text
+        i = self._pos
+        while i < len(text) and not (self._done or self._failed):
+            ch = text[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._key_start = i + 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_member(text, i, finished)
+                    self._done = not self._failed
+            elif ch == ":" and self._depth == 1 and self._value_start is None:
+                self._value_start = i + 1
+            elif ch == "," and self._depth == 1:
+                self._finish_member(text, i, finished)
+                self._key_start = i + 1
+            i += 1
+        self._pos = i
+        return finished
+
+    def _finish_member(self, text, end, finished):
+        if self._value_start is None:
+            return
+        try:
+            key = json.loads(text[self._key_start:self._value_start - 1].strip())
+            value = json.loads(text[self._value_start:end])
+        except ValueError:
+            # Not something we can parse member by member; callers fall back
+            # to parsing the full reply once the stream ends
+            self._failed = True
+            return
+        self._value_start = None
+        self.completed[key] = value
+        finished.append((key, value))
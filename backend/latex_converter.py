@@ -1,90 +1,556 @@
-def convert_tex_to_pdf_direct(tex_file_path, cls_file_path=None, additional_files=None):
+import atexit
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Precompiled formats (.fmt) for the fixed preambles in latex_preambles.py.
+# Loading titlesec/enumitem/hyperref/... is most of the work for a one page
+# document, so a known preamble is dumped once with mylatexformat and later
+# compiles only typeset the body.
+FORMAT_DIR = os.getenv("LATEX_FORMAT_DIR") or os.path.join(tempfile.gettempdir(), 'latex-formats')
+
+_known_preambles = {}   # normalized preamble -> format name
+_format_state = {}      # format name -> 'building' | 'ready' | 'failed'
+_format_lock = threading.Lock()
+
+
+def split_preamble(latex_content):
+    """Split a document into (preamble, rest starting at \\begin{document})"""
+    idx = latex_content.find('\\begin{document}')
+    if idx == -1:
+        return latex_content, ''
+    return latex_content[:idx], latex_content[idx:]
+
+
+def _normalize_preamble(preamble):
+    # Drop comments and collapse whitespace so cosmetic differences still match
+    lines = [re.sub(r'(?<!\\)%.*$', '', line) for line in preamble.split('\n')]
+    return re.sub(r'\s+', '', ''.join(lines))
+
+
+def register_preamble(name, preamble):
+    """
+    Register a preamble (exactly as it will reach the converter) that should
+    get a precompiled format. Returns the format name.
+    """
+    normalized = _normalize_preamble(preamble)
+    fmt_name = f"{name}-{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:12]}"
+    with _format_lock:
+        _known_preambles[normalized] = (fmt_name, preamble)
+    return fmt_name
+
+
+def build_format(fmt_name, preamble):
+    """Dump a .fmt for the preamble into FORMAT_DIR. Returns True on success."""
+    os.makedirs(FORMAT_DIR, exist_ok=True)
+    fmt_path = os.path.join(FORMAT_DIR, fmt_name + '.fmt')
+    if os.path.exists(fmt_path):
+        return True
+
+    build_dir = tempfile.mkdtemp(dir=FORMAT_DIR)
+    try:
+        src_path = os.path.join(build_dir, fmt_name + '.tex')
+        with open(src_path, 'w') as f:
+            f.write(preamble + '\\begin{document}\n\\end{document}\n')
+        result = subprocess.run(
+            ['pdflatex', '-ini', '-interaction=nonstopmode',
+             f'-jobname={fmt_name}', '&pdflatex', 'mylatexformat.ltx', src_path],
+            cwd=build_dir,
+            capture_output=True,
+            timeout=120
+        )
+        built = os.path.join(build_dir, fmt_name + '.fmt')
+        if result.returncode != 0 or not os.path.exists(built):
+            logger.warning(f"Could not build LaTeX format {fmt_name} (return code {result.returncode})")
+            return False
+        os.replace(built, fmt_path)
+        logger.info(f"Built LaTeX format {fmt_path}")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not build LaTeX format {fmt_name}: {e}")
+        return False
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def _claim_format(fmt_name):
+    """Current state of a format; a format nobody has built yet becomes 'building'"""
+    with _format_lock:
+        state = _format_state.get(fmt_name)
+        if state is None:
+            _format_state[fmt_name] = 'building'
+        return state
+
+
+def _build_claimed_format(fmt_name, preamble):
+    # Runs without the lock: a build can take up to two minutes
+    state = 'ready' if build_format(fmt_name, preamble) else 'failed'
+    with _format_lock:
+        _format_state[fmt_name] = state
+
+
+def mark_format_failed(fmt_name):
+    with _format_lock:
+        _format_state[fmt_name] = 'failed'
+
+
+def warm_formats():
+    """Build formats for every registered preamble (call once at startup)"""
+    with _format_lock:
+        entries = list(_known_preambles.values())
+    for fmt_name, preamble in entries:
+        if _claim_format(fmt_name) is None:
+            _build_claimed_format(fmt_name, preamble)
+
+
+def find_format(latex_content):
+    """
+    Return the format name to compile latex_content against, or None. Never
+    waits for a build: while a format is being built (or if it hasn't been
+    yet, in which case a background build starts) the caller compiles the
+    full document instead.
+    """
+    preamble, body = split_preamble(latex_content)
+    if not body:
+        return None
+    entry = _known_preambles.get(_normalize_preamble(preamble))
+    if entry is None:
+        return None
+    fmt_name, known = entry
+    state = _claim_format(fmt_name)
+    if state is None:
+        threading.Thread(target=_build_claimed_format, args=(fmt_name, known), daemon=True,
+                         name=f"latex-format-{fmt_name}").start()
+    return fmt_name if state == 'ready' else None
+
+
+# Upper bound on pdflatex passes; a second pass only runs when the log asks
+MAX_PASSES = int(os.getenv("LATEX_MAX_PASSES", 3))
+
+# Not "There were undefined references": a ref that is merely forward also
+# gets "Label(s) may have changed", and one that is really undefined stays so
+# however many passes run
+_RERUN_PATTERNS = [
+    re.compile(r'Rerun to get'),
+    re.compile(r'Label\(s\) may have changed'),
+    re.compile(r'Please rerun LaTeX'),
+    re.compile(r'\(rerunfilecheck\).*Rerun'),
+]
+
+
+def _pdflatex_env(fmt_name):
+    if not fmt_name:
+        return None
+    env = dict(os.environ)
+    # Trailing separator keeps the default format search path
+    env['TEXFORMATS'] = FORMAT_DIR + os.pathsep + env.get('TEXFORMATS', '')
+    return env
+
+
+# Compiles run in reusable work directories under LATEX_WORKDIR_ROOT, which
+# defaults to /dev/shm so the .tex, .aux, .log and .pdf never touch disk.
+# Static assets (resume.cls) are symlinked into a directory once and kept
+# across compiles; everything else is cleared when the directory is returned.
+def _default_workdir_root():
+    shm = '/dev/shm'
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return tempfile.gettempdir()
+
+
+WORKDIR_ROOT = os.getenv("LATEX_WORKDIR_ROOT") or _default_workdir_root()
+JOB_NAME = 'document'
+
+
+class _WorkDir:
+    def __init__(self, path):
+        self.path = path
+        self.assets = {}    # file name -> source path
+
+    def link(self, src):
+        src = os.path.abspath(src)
+        name = os.path.basename(src)
+        if self.assets.get(name) == src:
+            return
+        dst = os.path.join(self.path, name)
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        try:
+            os.symlink(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+        self.assets[name] = src
+
+    def reset(self):
+        """Remove everything the last compile left behind, keeping the assets"""
+        for entry in os.scandir(self.path):
+            if entry.name in self.assets:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _remove_stale_workdirs(root):
+    # Directories of processes that died without running their atexit hooks
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        m = re.fullmatch(r'latex-work-(\d+)-\w+', entry.name)
+        if m and entry.is_dir(follow_symlinks=False) and not _pid_alive(int(m.group(1))):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class _WorkDirPool:
+    """
+    Idle work directories, reused most-recently-returned first. They live in
+    one latex-work-<pid>-* directory per process, removed when it exits.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._idle = []
+        self._lock = threading.Lock()
+        self._dir = None
+        self._owner = None
+
+    def _process_dir(self):
+        # Caller holds the lock. A forked child gets a directory of its own
+        # rather than sharing (and at exit removing) its parent's.
+        if self._owner != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            _remove_stale_workdirs(self.root)
+            self._dir = tempfile.mkdtemp(prefix=f'latex-work-{os.getpid()}-', dir=self.root)
+            self._owner = os.getpid()
+            self._idle = []
+            atexit.register(self._cleanup, self._dir, self._owner)
+        return self._dir
+
+    @staticmethod
+    def _cleanup(path, owner):
+        if os.getpid() == owner:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def acquire(self):
+        with self._lock:
+            process_dir = self._process_dir()
+            if self._idle:
+                return self._idle.pop()
+        return _WorkDir(tempfile.mkdtemp(prefix='job-', dir=process_dir))
+
+    def release(self, workdir):
+        try:
+            workdir.reset()
+        except OSError as e:
+            logger.warning(f"Dropping LaTeX work directory {workdir.path}: {e}")
+            shutil.rmtree(workdir.path, ignore_errors=True)
+            return
+        with self._lock:
+            if os.path.dirname(workdir.path) == self._dir:
+                self._idle.append(workdir)
+
+
+_workdirs = _WorkDirPool(WORKDIR_ROOT)
+
+
+def _write_source(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def convert_latex_to_pdf_bytes(latex_content, assets=None, use_formats=True, max_passes=None,
+                               stats=None, deadline=None, cancel=None):
+    """
+    Compile LaTeX given as str or bytes and return the PDF bytes.
+    assets are files the document needs next to it (e.g. resume.cls); they
+    are linked into the work directory, not copied.
+    If the preamble matches a registered one, the body is compiled against the
+    precompiled format; on failure it falls back to a full compile.
+    Pass a dict as stats to get back the number of pdflatex passes used
+    ("passes") and their total CPU time ("cpu_seconds").
+    deadline (a time.monotonic() value) and cancel (a callable) bound how long
+    pdflatex may run; see _run_pdflatex.
+    """
+    if isinstance(latex_content, str):
+        latex_bytes = latex_content.encode('utf-8')
+    else:
+        latex_bytes = bytes(latex_content)
+        latex_content = latex_bytes.decode('utf-8', errors='ignore')
+    for asset in assets or ():
+        if not os.path.exists(asset):
+            raise FileNotFoundError(f"Asset file not found: {asset}")
+
+    workdir = _workdirs.acquire()
+    try:
+        for asset in assets or ():
+            workdir.link(asset)
+        tex_path = os.path.join(workdir.path, JOB_NAME + '.tex')
+        pdf_path = os.path.join(workdir.path, JOB_NAME + '.pdf')
+
+        fmt_name = find_format(latex_content) if use_formats else None
+        if fmt_name:
+            # The preamble lives in the format, so only the body is typeset
+            _write_source(tex_path, split_preamble(latex_content)[1].encode('utf-8'))
+            _compile(workdir.path, tex_path, fmt_name, max_passes, stats, deadline, cancel)
+            if os.path.exists(pdf_path):
+                with open(pdf_path, 'rb') as f:
+                    return f.read()
+            logger.warning(f"Compile against format {fmt_name} failed, falling back to full compile")
+            workdir.reset()
+
+        _write_source(tex_path, latex_bytes)
+        result = _compile(workdir.path, tex_path, None, max_passes, stats, deadline, cancel)
+
+        if os.path.exists(pdf_path):
+            if fmt_name:
+                # Full compile worked where the format didn't, so stop using it
+                mark_format_failed(fmt_name)
+            with open(pdf_path, 'rb') as f:
+                return f.read()
+        raise Exception(_compile_error(result, os.path.join(workdir.path, JOB_NAME + '.log')))
+    finally:
+        _workdirs.release(workdir)
+
+
+def _compile_error(result, log_path):
+    # PDF not created - show pdflatex output for debugging
+    error_msg = f"PDF compilation failed. "
+    if result:
+        error_msg += f"Return code: {result.returncode}\n"
+
+        # Check log file for detailed error
+        if os.path.exists(log_path):
+            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+                log_content = f.read()
+                # Find the actual error in the log
+                lines = log_content.split('\n')
+                error_lines = []
+                for i, line in enumerate(lines):
+                    if '!' in line or 'Error' in line or 'error' in line:
+                        # Include context around errors
+                        start = max(0, i-2)
+                        end = min(len(lines), i+5)
+                        error_lines.extend(lines[start:end])
+                if error_lines:
+                    error_msg += f"\nLog errors:\n" + '\n'.join(error_lines[:50])
+                else:
+                    # Show last part of log if no specific errors found
+                    error_msg += f"\nLast 2000 chars of log:\n{log_content[-2000:]}"
+
+        if result.stderr:
+            error_msg += f"\n\nStderr:\n{result.stderr.decode('utf-8', errors='ignore')[:2000]}"
+        if result.stdout:
+            error_msg += f"\n\nStdout:\n{result.stdout.decode('utf-8', errors='ignore')[:2000]}"
+    return error_msg
+
+
+def convert_tex_to_pdf_direct(tex_file_path, cls_file_path=None, additional_files=None, use_formats=True,
+                              max_passes=None, stats=None, deadline=None, cancel=None):
     """
     Directly convert TeX to PDF and return the PDF bytes
     Can be imported and used in other Python files
+    File-based wrapper around convert_latex_to_pdf_bytes(); cls_file_path and
+    additional_files are made available next to the document.
     """
-    import os
-    import subprocess
-    import tempfile
-    import shutil
-    from pathlib import Path
-    
     if not os.path.exists(tex_file_path):
         raise FileNotFoundError(f"TeX file not found: {tex_file_path}")
     
     if cls_file_path and not os.path.exists(cls_file_path):
         raise FileNotFoundError(f"Class file not found: {cls_file_path}")
-    
-    temp_dir = tempfile.mkdtemp()
-    
+
+    assets = [cls_file_path] if cls_file_path else []
+    assets += [path for path in additional_files or () if os.path.exists(path)]
+    with open(tex_file_path, 'rb') as f:
+        latex_bytes = f.read()
+    return convert_latex_to_pdf_bytes(latex_bytes, assets, use_formats, max_passes, stats, deadline, cancel)
+
+
+class CompileCancelled(Exception):
+    """pdflatex was killed because the caller went away"""
+
+
+def _run_pdflatex(cmd, cwd, env, deadline=None, cancel=None, timeout=30):
+    """
+    subprocess.run() for pdflatex that also kills the process when the
+    deadline (time.monotonic() value) passes or cancel() returns True.
+    The child is reaped with wait4() so the result also carries its CPU time
+    (result.cpu_seconds, user + system).
+    """
+    import time
+
+    limit = time.monotonic() + timeout
+    if deadline is not None:
+        limit = min(limit, deadline)
+
+    # Output goes to anonymous files rather than pipes: nothing has to drain
+    # them while we poll, and they are only read back for error messages
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=err)
+        try:
+            poll = 0.005
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid:
+                    proc.returncode = os.waitstatus_to_exitcode(status)
+                    out.seek(0)
+                    err.seek(0)
+                    result = subprocess.CompletedProcess(cmd, proc.returncode, out.read(), err.read())
+                    result.cpu_seconds = usage.ru_utime + usage.ru_stime
+                    return result
+                if cancel is not None and cancel():
+                    raise CompileCancelled("Compilation cancelled")
+                if time.monotonic() >= limit:
+                    raise TimeoutError("pdflatex exceeded the compile deadline")
+                time.sleep(poll)
+                poll = min(poll * 2, 0.1)
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                proc.wait()
+
+
+def needs_rerun(log_content):
+    """True if the pdflatex log asks for another pass (labels, refs, rerunfilecheck)"""
+    return any(p.search(log_content) for p in _RERUN_PATTERNS)
+
+
+def _pdflatex_cmd(temp_dir, temp_tex_path, fmt_name):
+    cmd = ['pdflatex', '-interaction=nonstopmode']
+    if fmt_name:
+        cmd.append(f'-fmt={fmt_name}')
+    return cmd + ['-output-directory', temp_dir, temp_tex_path]
+
+
+def _log_wants_rerun(temp_dir, temp_tex_path):
+    from pathlib import Path
+
+    log_path = os.path.join(temp_dir, Path(temp_tex_path).stem + '.log')
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return needs_rerun(f.read())
+    except FileNotFoundError:
+        return False
+
+
+def _compile(temp_dir, temp_tex_path, fmt_name=None, max_passes=None, stats=None,
+             deadline=None, cancel=None):
+    """
+    Run pdflatex once, then again only while the log asks for a rerun,
+    up to max_passes. Returns the last CompletedProcess.
+    """
+    if max_passes is None:
+        max_passes = MAX_PASSES
+    cmd = _pdflatex_cmd(temp_dir, temp_tex_path, fmt_name)
+
+    result = None
+    for i in range(max(1, max_passes)):
+        result = _run_pdflatex(cmd, temp_dir, _pdflatex_env(fmt_name), deadline, cancel)
+        if stats is not None:
+            stats['passes'] = stats.get('passes', 0) + 1
+            stats['cpu_seconds'] = stats.get('cpu_seconds', 0.0) + result.cpu_seconds
+        if not _log_wants_rerun(temp_dir, temp_tex_path):
+            break
+    return result
+
+
+# asyncio variants for the async server (async_app.py). Cancelling the awaiting
+# task stops pdflatex, so there is no cancel callback. asyncio reaps the
+# children itself, so stats only get "passes" here, not "cpu_seconds".
+
+async def _run_pdflatex_async(cmd, cwd, env, deadline=None, timeout=30):
+    import asyncio
+    import time
+
+    limit = timeout
+    if deadline is not None:
+        limit = min(limit, deadline - time.monotonic())
+
+    proc = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env,
+                                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     try:
-        # Copy files to temp directory
-        tex_filename = os.path.basename(tex_file_path)
-        temp_tex_path = os.path.join(temp_dir, tex_filename)
-        shutil.copy2(tex_file_path, temp_tex_path)
-        
-        if cls_file_path:
-            cls_filename = os.path.basename(cls_file_path)
-            temp_cls_path = os.path.join(temp_dir, cls_filename)
-            shutil.copy2(cls_file_path, temp_cls_path)
-        
-        if additional_files:
-            for file_path in additional_files:
-                if os.path.exists(file_path):
-                    filename = os.path.basename(file_path)
-                    shutil.copy2(file_path, os.path.join(temp_dir, filename))
-        
-        # Compile TeX to PDF
-        result = None
-        for i in range(2):
-            result = subprocess.run(
-                ['pdflatex', '-interaction=nonstopmode',
-                 '-output-directory', temp_dir, temp_tex_path],
-                cwd=temp_dir,
-                capture_output=True,
-                timeout=30
-            )
-
-        # Read the PDF file
-        pdf_name = Path(tex_filename).stem + '.pdf'
-        pdf_path = os.path.join(temp_dir, pdf_name)
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), max(0.0, limit))
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    except asyncio.TimeoutError:
+        raise TimeoutError("pdflatex exceeded the compile deadline")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def _compile_async(temp_dir, temp_tex_path, fmt_name=None, max_passes=None, stats=None, deadline=None):
+    if max_passes is None:
+        max_passes = MAX_PASSES
+    cmd = _pdflatex_cmd(temp_dir, temp_tex_path, fmt_name)
+
+    result = None
+    for i in range(max(1, max_passes)):
+        result = await _run_pdflatex_async(cmd, temp_dir, _pdflatex_env(fmt_name), deadline)
+        if stats is not None:
+            stats['passes'] = stats.get('passes', 0) + 1
+        if not _log_wants_rerun(temp_dir, temp_tex_path):
+            break
+    return result
+
+
+async def convert_latex_to_pdf_bytes_async(latex_content, assets=None, use_formats=True, max_passes=None,
+                                           stats=None, deadline=None):
+    """convert_latex_to_pdf_bytes() with pdflatex run as an asyncio subprocess"""
+    if isinstance(latex_content, str):
+        latex_bytes = latex_content.encode('utf-8')
+    else:
+        latex_bytes = bytes(latex_content)
+        latex_content = latex_bytes.decode('utf-8', errors='ignore')
+    for asset in assets or ():
+        if not os.path.exists(asset):
+            raise FileNotFoundError(f"Asset file not found: {asset}")
+
+    workdir = _workdirs.acquire()
+    try:
+        for asset in assets or ():
+            workdir.link(asset)
+        tex_path = os.path.join(workdir.path, JOB_NAME + '.tex')
+        pdf_path = os.path.join(workdir.path, JOB_NAME + '.pdf')
+
+        # find_format() never waits for a build, so it is safe on the event loop
+        fmt_name = find_format(latex_content) if use_formats else None
+        if fmt_name:
+            _write_source(tex_path, split_preamble(latex_content)[1].encode('utf-8'))
+            await _compile_async(workdir.path, tex_path, fmt_name, max_passes, stats, deadline)
+            if os.path.exists(pdf_path):
+                with open(pdf_path, 'rb') as f:
+                    return f.read()
+            logger.warning(f"Compile against format {fmt_name} failed, falling back to full compile")
+            workdir.reset()
+
+        _write_source(tex_path, latex_bytes)
+        result = await _compile_async(workdir.path, tex_path, None, max_passes, stats, deadline)
 
         if os.path.exists(pdf_path):
+            if fmt_name:
+                mark_format_failed(fmt_name)
             with open(pdf_path, 'rb') as f:
-                pdf_bytes = f.read()
-            return pdf_bytes
-        else:
-            # PDF not created - show pdflatex output for debugging
-            error_msg = f"PDF compilation failed. "
-            if result:
-                error_msg += f"Return code: {result.returncode}\n"
-
-                # Check log file for detailed error
-                log_name = Path(tex_filename).stem + '.log'
-                log_path = os.path.join(temp_dir, log_name)
-                if os.path.exists(log_path):
-                    with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        log_content = f.read()
-                        # Find the actual error in the log
-                        lines = log_content.split('\n')
-                        error_lines = []
-                        for i, line in enumerate(lines):
-                            if '!' in line or 'Error' in line or 'error' in line:
-                                # Include context around errors
-                                start = max(0, i-2)
-                                end = min(len(lines), i+5)
-                                error_lines.extend(lines[start:end])
-                        if error_lines:
-                            error_msg += f"\nLog errors:\n" + '\n'.join(error_lines[:50])
-                        else:
-                            # Show last part of log if no specific errors found
-                            error_msg += f"\nLast 2000 chars of log:\n{log_content[-2000:]}"
-
-                if result.stderr:
-                    error_msg += f"\n\nStderr:\n{result.stderr.decode('utf-8', errors='ignore')[:2000]}"
-                if result.stdout:
-                    error_msg += f"\n\nStdout:\n{result.stdout.decode('utf-8', errors='ignore')[:2000]}"
-            raise Exception(error_msg)
-    
+                return f.read()
+        raise Exception(_compile_error(result, os.path.join(workdir.path, JOB_NAME + '.log')))
     finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
\ No newline at end of file
+        _workdirs.release(workdir)
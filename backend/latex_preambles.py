@@ -0,0 +1,44 @@
+# Fixed LaTeX preambles the model is told to emit verbatim. They are shared
+# between the /generate system prompt and the converter's precompiled formats.
+
+RESUME_PREAMBLE = (
+    "\\DocumentMetadata{}\n"
+    "\\documentclass[letterpaper,11pt]{article}\n"
+    "\\usepackage{latexsym}\n"
+    "\\usepackage[empty]{fullpage}\n"
+    "\\usepackage{titlesec}\n"
+    "\\usepackage{marvosym}\n"
+    "\\usepackage[usenames,dvipsnames]{color}\n"
+    "\\usepackage{verbatim}\n"
+    "\\usepackage{enumitem}\n"
+    "\\usepackage[hidelinks]{hyperref}\n"
+    "\\usepackage{fancyhdr}\n"
+    "\\usepackage{tabularx}\n"
+    "\\pagestyle{fancy}\n"
+    "\\fancyhf{}\n"
+    "\\renewcommand{\\headrulewidth}{0pt}\n"
+    "\\addtolength{\\oddsidemargin}{-0.5in}\n"
+    "\\addtolength{\\evensidemargin}{-0.5in}\n"
+    "\\addtolength{\\textwidth}{1in}\n"
+    "\\addtolength{\\topmargin}{-.5in}\n"
+    "\\addtolength{\\textheight}{1.0in}\n"
+    "\\urlstyle{same}\n"
+    "\\raggedbottom\n"
+    "\\raggedright\n"
+    "\\setlength{\\tabcolsep}{0in}\n"
+    "\\titleformat{\\section}{\\vspace{-4pt}\\scshape\\raggedright\\large}{}{0em}{}[\\color{black}\\titlerule \\vspace{-5pt}]\n"
+    "\\newcommand{\\resumeItem}[1]{\\item\\small{{#1 \\vspace{-2pt}}}}\n"
+    "\\newcommand{\\resumeSubheading}[4]{\\vspace{-2pt}\\item\\begin{tabular*}{0.97\\textwidth}[t]{l@{\\extracolsep{\\fill}}r}\\textbf{#1} & #2 \\\\\\textit{\\small#3} & \\textit{\\small #4} \\\\\\end{tabular*}\\vspace{-7pt}}\n"
+    "\\newcommand{\\resumeProjectHeading}[2]{\\item\\begin{tabular*}{0.97\\textwidth}{l@{\\extracolsep{\\fill}}r}\\small#1 & #2 \\\\\\end{tabular*}\\vspace{-7pt}}\n"
+    "\\newcommand{\\resumeSubHeadingListStart}{\\begin{itemize}[leftmargin=0.15in, label={}]}\n"
+    "\\newcommand{\\resumeSubHeadingListEnd}{\\end{itemize}}\n"
+    "\\newcommand{\\resumeItemListStart}{\\begin{itemize}}\n"
+    "\\newcommand{\\resumeItemListEnd}{\\end{itemize}\\vspace{-5pt}}\n"
+)
+
+COVER_LETTER_PREAMBLE = (
+    "\\DocumentMetadata{}\n"
+    "\\documentclass[11pt,letterpaper]{article}\n"
+    "\\usepackage[margin=1in]{geometry}\n"
+    "\\usepackage{parskip}\n"
+)
@@ -0,0 +1,454 @@
+# Pre-flight validation and repair of model-generated LaTeX.
+# One tokenizing pass replaces the old regex fix-ups (ampersands,
+# \DocumentMetadata, tabular tagging fix) and catches documents pdflatex would
+# only reject after burning a full compile: unbalanced braces, unclosed
+# environments, missing \end{document} and unescaped % $ _ # in body text.
+# Undefined \resume* macros are only warned about: pdflatex still produces a
+# PDF for them in nonstopmode.
+
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Fix for TeX Live 2024+ tagging system in tabular environments
+TAGGING_FIX = r'''
+% Fix for TeX Live 2024+ tagging system in tabular environments
+\makeatletter
+\@ifundefined{tagpdfparaOff}{}{
+  \AddToHook{env/tabular*/begin}{\tagpdfparaOff}
+  \AddToHook{env/tabular*/end}{\tagpdfparaOn}
+  \AddToHook{env/tabular/begin}{\tagpdfparaOff}
+  \AddToHook{env/tabular/end}{\tagpdfparaOn}
+}
+\makeatother
+'''
+
+# Environments where & is an alignment tab, not text
+_ALIGN_ENVS = {'tabular', 'tabular*', 'tabularx', 'array', 'align', 'align*',
+               'alignat', 'alignat*', 'eqnarray', 'eqnarray*', 'matrix', 'pmatrix',
+               'bmatrix', 'cases', 'split', 'longtable'}
+# Environments whose contents are not LaTeX
+_VERBATIM_ENVS = {'verbatim', 'verbatim*', 'lstlisting', 'comment', 'minted'}
+_MATH_ENVS = {'equation', 'equation*', 'math', 'displaymath', 'align', 'align*',
+              'alignat', 'alignat*', 'eqnarray', 'eqnarray*', 'gather', 'gather*',
+              'multline', 'multline*'}
+
+# Macros whose first argument is a URL, label or file name and must be copied
+# verbatim (escaping _ or & there would break it)
+_RAW_ARG_MACROS = {'url', 'href', 'label', 'ref', 'pageref', 'eqref', 'cite',
+                   'input', 'include', 'includegraphics', 'hypersetup', 'nolinkurl'}
+
+_DEFINITION_RE = re.compile(
+    r'\\(?:(?:re)?newcommand|providecommand|DeclareRobustCommand)\*?\s*\{?\s*\\([A-Za-z]+)'
+    r'|\\[gex]?def\s*\\([A-Za-z]+)'
+)
+# Macros whose replacement text may use #1..#9 as parameters
+_DEFINITION_MACROS = {'newcommand', 'renewcommand', 'providecommand', 'DeclareRobustCommand',
+                      'def', 'gdef', 'edef', 'xdef'}
+# An amount right after a $: "$5 and", "$50K/yr", "$1,200." (not "$10$", "$10^6$")
+_PRICE_RE = re.compile(r'\d[\d,]*(?:\.\d+)?[KkMmBb]?\+?(?=[\s.,;:!?)/-])')
+# Tokens that only make sense in math mode
+_MATH_ONLY_RE = re.compile(r'[\^_]|\\(?:times|cdot|frac|sqrt|leq?|geq?|pm|approx|sim|infty)(?![A-Za-z])')
+_CLS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'LaTex', 'resume.cls')
+
+
+class LatexValidationError(ValueError):
+    """The document can't be repaired into something pdflatex will accept"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class PreflightResult:
+    def __init__(self, latex, repairs, errors, warnings=()):
+        self.latex = latex
+        self.repairs = repairs
+        self.errors = errors
+        self.warnings = list(warnings)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _defined_macros(latex_content):
+    names = set()
+    sources = [latex_content]
+    if re.search(r'\\documentclass(\[[^\]]*\])?\{resume\}', latex_content) and os.path.exists(_CLS_PATH):
+        with open(_CLS_PATH, 'r', encoding='utf-8', errors='ignore') as f:
+            sources.append(f.read())
+    for source in sources:
+        for m in _DEFINITION_RE.finditer(source):
+            names.add(m.group(1) or m.group(2))
+    return names
+
+
+def _environment_macros(latex_content):
+    """
+    Macros defined to open or close an environment without closing or opening
+    it again, e.g. \\resumeItemListStart -> ('begin', 'itemize')
+    """
+    macros = {}
+    for m in _DEFINITION_RE.finditer(latex_content):
+        kind = re.match(r'\\([A-Za-z]+)', latex_content[m.start():]).group(1)
+        start = m.start() + 1 + len(kind)
+        replacement = latex_content[m.end():_definition_end(latex_content, start, kind)]
+        begins = re.findall(r'\\begin\s*\{([^{}]*)\}', replacement)
+        ends = re.findall(r'\\end\s*\{([^{}]*)\}', replacement)
+        if len(begins) == 1 and not ends:
+            macros[m.group(1) or m.group(2)] = ('begin', begins[0])
+        elif len(ends) == 1 and not begins:
+            macros[m.group(1) or m.group(2)] = ('end', ends[0])
+    return macros
+
+
+def _read_group(text, i):
+    """If text[i:] starts (after spaces) with {name}, return (name, end index)"""
+    j = i
+    while j < len(text) and text[j] in ' \t':
+        j += 1
+    if j < len(text) and text[j] == '{':
+        k = text.find('}', j)
+        if k != -1 and '\n' not in text[j:k]:
+            return text[j + 1:k], k + 1
+    return None, i
+
+
+def _raw_arg_end(text, j):
+    """End of the (optional [...] then) {...} argument starting at j, or j if none"""
+    k = j
+    while k < len(text) and text[k] in ' \t':
+        k += 1
+    if k < len(text) and text[k] == '[':
+        close = text.find(']', k)
+        if close == -1:
+            return j
+        k = close + 1
+    if k >= len(text) or text[k] != '{':
+        return j
+    depth = 0
+    while k < len(text):
+        if text[k] == '\\':
+            k += 2
+            continue
+        if text[k] == '{':
+            depth += 1
+        elif text[k] == '}':
+            depth -= 1
+            if depth == 0:
+                return k + 1
+        k += 1
+    return j
+
+
+def _definition_end(text, j, name):
+    """End of the replacement text of the definition whose name ends at j, or j"""
+    k = j
+    if name.endswith('def'):
+        # \def\name<parameter text>{replacement}
+        brace = text.find('{', k)
+        return j if brace == -1 else _raw_arg_end(text, brace)
+    if text[k:k + 1] == '*':
+        k += 1
+    while k < len(text) and text[k] in ' \t':
+        k += 1
+    if text[k:k + 1] == '{':
+        close = text.find('}', k)
+        if close == -1:
+            return j
+        k = close + 1
+    elif text[k:k + 1] == '\\':
+        k += 1
+        while k < len(text) and text[k].isalpha():
+            k += 1
+    # [number of arguments][default], then {replacement}
+    while True:
+        while k < len(text) and text[k] in ' \t':
+            k += 1
+        if text[k:k + 1] != '[':
+            break
+        close = text.find(']', k)
+        if close == -1:
+            return j
+        k = close + 1
+    return _raw_arg_end(text, k)
+
+
+def _closing_dollar(text, i):
+    """Index of the $ closing math opened at i, or -1 if the paragraph has none"""
+    j = i + 1
+    while j < len(text):
+        ch = text[j]
+        if ch == '\\':
+            j += 2
+            continue
+        if ch == '$':
+            return j
+        if ch == '\n':
+            k = j + 1
+            while k < len(text) and text[k] in ' \t\r':
+                k += 1
+            if k < len(text) and text[k] == '\n':
+                return -1
+        j += 1
+    return -1
+
+
+def _is_currency(text, i, close):
+    """
+    True if the $ at i is money rather than math: nothing closes it in the
+    paragraph, or what it "encloses" is an amount followed by prose, as in
+    "$5 and $10" or "$50K per year ... $|$"
+    """
+    if close == -1:
+        return True
+    content = text[i + 1:close]
+    return bool(_PRICE_RE.match(content)) and not _MATH_ONLY_RE.search(content)
+
+
+def preflight_latex(latex_content):
+    """
+    Validate and repair a LaTeX document in one pass.
+    Returns a PreflightResult; result.errors is non-empty if pdflatex would
+    certainly fail and no safe repair exists. result.warnings lists problems
+    pdflatex gets past in nonstopmode (the PDF is still produced).
+    """
+    text = latex_content
+    out = []
+    repairs = []
+    errors = []
+    warnings = []
+    counts = {}
+
+    def repaired(kind):
+        counts[kind] = counts.get(kind, 0) + 1
+
+    defined = _defined_macros(text)
+    env_macros = _environment_macros(text)
+    in_body = False
+    seen_metadata = False
+    seen_documentclass = False
+    seen_end_document = False
+    tagging_fixed = 'tagpdfparaOff' in text
+    depth = 0
+    env_stack = []
+    math = None     # None or its closing delimiter: '$', '$$', '\\)' or '\\]'
+    definition_end = 0  # #1..#9 are parameters before this index
+    i = 0
+    n = len(text)
+
+    def align_active():
+        return any(env in _ALIGN_ENVS for env in env_stack)
+
+    def math_env_active():
+        return any(env in _MATH_ENVS for env in env_stack)
+
+    def close_env(env):
+        # Pops env, closing whatever was left open inside it; False if it isn't open
+        if env_stack and env_stack[-1] == env:
+            env_stack.pop()
+        elif env in env_stack:
+            while env_stack[-1] != env:
+                out.append(f'\\end{{{env_stack.pop()}}}')
+                repaired('closed unterminated environments')
+            env_stack.pop()
+        else:
+            return False
+        return True
+
+    while i < n:
+        ch = text[i]
+
+        if ch == '\\':
+            j = i + 1
+            while j < n and text[j].isalpha():
+                j += 1
+            if j == i + 1:
+                # Control symbol (\&, \%, \\, \{ ...), or \( \) \[ \] math
+                if in_body and math and text.startswith(math, i):
+                    math = None
+                elif in_body and not math and not math_env_active() and text[i + 1:i + 2] in ('(', '['):
+                    math = '\\)' if text[i + 1] == '(' else '\\]'
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            name = text[i + 1:j]
+
+            if name == 'DocumentMetadata':
+                seen_metadata = True
+            elif name == 'documentclass':
+                if not seen_metadata:
+                    out.append('\\DocumentMetadata{}\n')
+                    seen_metadata = True
+                    repaired('added \\DocumentMetadata{}')
+                seen_documentclass = True
+            elif name in ('begin', 'end'):
+                env, k = _read_group(text, j)
+                if env is not None:
+                    if name == 'begin' and env == 'document':
+                        if depth != 0:
+                            errors.append("Unbalanced braces in the preamble")
+                        if not tagging_fixed:
+                            out.append(TAGGING_FIX + '\n')
+                            tagging_fixed = True
+                        in_body = True
+                        depth = 0
+                        env_stack = []
+                        out.append(text[i:k])
+                        i = k
+                        continue
+                    if name == 'end' and env == 'document':
+                        if not in_body:
+                            errors.append("\\end{document} without \\begin{document}")
+                        if math:
+                            out.append(math)
+                            math = None
+                            repaired('closed unterminated math')
+                        if depth > 0:
+                            out.append('}' * depth)
+                            repaired('closed unbalanced braces')
+                            depth = 0
+                        while env_stack:
+                            out.append(f'\\end{{{env_stack.pop()}}}\n')
+                            repaired('closed unterminated environments')
+                        # Anything after \end{document} is ignored by LaTeX
+                        out.append(text[i:])
+                        seen_end_document = True
+                        break
+                    if name == 'begin':
+                        if in_body:
+                            env_stack.append(env)
+                        out.append(text[i:k])
+                        i = k
+                        if env in _VERBATIM_ENVS:
+                            end_tag = f'\\end{{{env}}}'
+                            e = text.find(end_tag, i)
+                            if e == -1:
+                                errors.append(f"Unterminated {env} environment")
+                                e = n
+                            out.append(text[i:e])
+                            i = e
+                        continue
+                    if name == 'end' and in_body and not close_env(env):
+                        errors.append(f"\\end{{{env}}} without matching \\begin{{{env}}}")
+                    out.append(text[i:k])
+                    i = k
+                    continue
+            elif in_body and name in env_macros:
+                # \resumeItemListStart and friends open and close lists too
+                action, env = env_macros[name]
+                if action == 'begin':
+                    env_stack.append(env)
+                elif not close_env(env):
+                    errors.append(f"\\{name} without matching \\begin{{{env}}}")
+            elif in_body and name.startswith('resume') and name not in defined:
+                warnings.append(f"Undefined macro \\{name}")
+            elif in_body and name == 'verb':
+                # \verb|...|: copied as is up to the closing delimiter
+                k = j + 1 if text[j:j + 1] == '*' else j
+                e = text.find(text[k:k + 1], k + 1) if k < n else -1
+                if e != -1 and '\n' not in text[k:e]:
+                    out.append(text[i:e + 1])
+                    i = e + 1
+                    continue
+            elif in_body and name in _DEFINITION_MACROS:
+                definition_end = max(definition_end, _definition_end(text, j, name))
+            elif in_body and name in _RAW_ARG_MACROS:
+                k = _raw_arg_end(text, j)
+                out.append(text[i:k])
+                i = k
+                continue
+
+            out.append(text[i:j])
+            i = j
+            continue
+
+        if ch == '%':
+            # In the body, "50%" is almost always meant literally
+            if in_body and i > 0 and text[i - 1].isdigit():
+                out.append('\\%')
+                repaired('escaped %')
+                i += 1
+                continue
+            e = text.find('\n', i)
+            e = n if e == -1 else e
+            out.append(text[i:e])
+            i = e
+            continue
+
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            if depth == 0:
+                if in_body:
+                    repaired('dropped unmatched }')
+                    i += 1
+                    continue
+                errors.append("Unbalanced braces in the preamble")
+            else:
+                depth -= 1
+        elif in_body and ch == '$':
+            if math:
+                if text.startswith(math, i):
+                    out.append(math)
+                    i += len(math)
+                    math = None
+                    continue
+            elif text.startswith('$$', i):
+                math = '$$'
+                out.append('$$')
+                i += 2
+                continue
+            else:
+                if _is_currency(text, i, _closing_dollar(text, i)):
+                    out.append('\\$')
+                    repaired('escaped $')
+                    i += 1
+                    continue
+                math = '$'
+        elif in_body and not math and not math_env_active():
+            if ch == '&' and not align_active():
+                out.append('\\&')
+                repaired('escaped &')
+                i += 1
+                continue
+            parameter = i < definition_end and text[i + 1:i + 2].isdigit()
+            if ch == '_' or (ch == '#' and not parameter):
+                out.append('\\' + ch)
+                repaired(f'escaped {ch}')
+                i += 1
+                continue
+
+        out.append(ch)
+        i += 1
+
+    if not seen_documentclass:
+        errors.append("Missing \\documentclass")
+    if not in_body:
+        errors.append("Missing \\begin{document}")
+    elif not seen_end_document:
+        if math:
+            out.append(math)
+            repaired('closed unterminated math')
+        if depth > 0:
+            out.append('}' * depth)
+            repaired('closed unbalanced braces')
+        while env_stack:
+            out.append(f'\n\\end{{{env_stack.pop()}}}')
+            repaired('closed unterminated environments')
+        out.append('\n\\end{document}\n')
+        repaired('added \\end{document}')
+
+    for kind, count in counts.items():
+        repairs.append(f"{kind} (x{count})" if count > 1 else kind)
+    if repairs:
+        logger.info("LaTeX preflight repairs: " + ", ".join(repairs))
+    # Same message only once, in first-seen order
+    errors = list(dict.fromkeys(errors))
+    warnings = list(dict.fromkeys(warnings))
+    if warnings:
+        logger.warning("LaTeX preflight warnings: " + ", ".join(warnings))
+    return PreflightResult(''.join(out), repairs, errors, warnings)
@@ -0,0 +1,208 @@
+# Render structured resume / cover-letter data into LaTeX.
+# The model only returns section content; preambles and macros come from
+# latex_preambles.py (same layout as LaTex/professional_template.tex), and every
+# user-supplied string goes through escape_latex() here, once.
+
+import re
+
+from latex_preambles import RESUME_PREAMBLE, COVER_LETTER_PREAMBLE
+
+_LATEX_SPECIALS = {
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+}
+_LATEX_SPECIALS_RE = re.compile(r'[\\&%$#_{}~^]')
+
+
+def escape_latex(text):
+    """Escape plain text for use in a LaTeX document body"""
+    if text is None:
+        return ''
+    return _LATEX_SPECIALS_RE.sub(lambda m: _LATEX_SPECIALS[m.group()], str(text))
+
+
+def _escape_url(url):
+    # Inside \href only % and # need escaping; braces/backslashes would break it
+    url = re.sub(r'[\\{}\s]', '', str(url or ''))
+    return url.replace('%', r'\%').replace('#', r'\#')
+
+
+def _list(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if v]
+    return [value]
+
+
+def _bullets(items):
+    items = _list(items)
+    if not items:
+        return []
+    lines = [r'      \resumeItemListStart']
+    lines += [f'        \\resumeItem{{{escape_latex(item)}}}' for item in items]
+    lines.append(r'      \resumeItemListEnd')
+    return lines
+
+
+def _link(url, label=None):
+    url = (url or '').strip()
+    if not url:
+        return ''
+    href = url if re.match(r'^[a-z]+:', url) else 'https://' + url
+    shown = label or re.sub(r'^https?://(www\.)?', '', url).rstrip('/')
+    return f'\\href{{{_escape_url(href)}}}{{\\underline{{{escape_latex(shown)}}}}}'
+
+
+def _heading(heading):
+    name = escape_latex(heading.get('name') or 'First Last')
+    contacts = []
+    if heading.get('phone'):
+        contacts.append(escape_latex(heading['phone']))
+    if heading.get('email'):
+        email = heading['email'].strip()
+        contacts.append(f'\\href{{mailto:{_escape_url(email)}}}{{\\underline{{{escape_latex(email)}}}}}')
+    for key in ('linkedin', 'github', 'website'):
+        if heading.get(key):
+            contacts.append(_link(heading[key]))
+    if heading.get('location'):
+        contacts.append(escape_latex(heading['location']))
+
+    lines = [r'\begin{center}', f'    \\textbf{{\\Huge \\scshape {name}}} \\\\ \\vspace{{1pt}}']
+    if contacts:
+        lines.append('    \\small ' + ' $|$ '.join(contacts))
+    lines.append(r'\end{center}')
+    return lines
+
+
+def _education(entries):
+    lines = [r'\section{Education}', r'  \resumeSubHeadingListStart']
+    for e in entries:
+        lines.append(
+            f'    \\resumeSubheading{{{escape_latex(e.get("school"))}}}{{{escape_latex(e.get("dates"))}}}'
+            f'{{{escape_latex(e.get("degree"))}}}{{{escape_latex(e.get("location"))}}}'
+        )
+        lines += _bullets(e.get('details'))
+    lines.append(r'  \resumeSubHeadingListEnd')
+    return lines
+
+
+def _experience(entries, title='Experience'):
+    lines = [f'\\section{{{escape_latex(title)}}}', r'  \resumeSubHeadingListStart']
+    for e in entries:
+        lines.append(
+            f'    \\resumeSubheading{{{escape_latex(e.get("title"))}}}{{{escape_latex(e.get("dates"))}}}'
+            f'{{{escape_latex(e.get("company"))}}}{{{escape_latex(e.get("location"))}}}'
+        )
+        lines += _bullets(e.get('bullets'))
+    lines.append(r'  \resumeSubHeadingListEnd')
+    return lines
+
+
+def _projects(entries):
+    lines = [r'\section{Projects}', r'  \resumeSubHeadingListStart']
+    for p in entries:
+        title = f'\\textbf{{{escape_latex(p.get("name"))}}}'
+        tech = _list(p.get('tech'))
+        if tech:
+            title += f' $|$ \\emph{{{escape_latex(", ".join(tech))}}}'
+        lines.append(f'    \\resumeProjectHeading{{{title}}}{{{escape_latex(p.get("dates"))}}}')
+        lines += _bullets(p.get('bullets'))
+    lines.append(r'  \resumeSubHeadingListEnd')
+    return lines
+
+
+def _skills(groups):
+    rows = []
+    for g in groups:
+        items = g.get('items')
+        if isinstance(items, (list, tuple)):
+            items = ', '.join(str(i) for i in items if i)
+        rows.append(f'     \\textbf{{{escape_latex(g.get("category"))}}}{{: {escape_latex(items)}}}')
+    return [
+        r'\section{Technical Skills}',
+        r' \begin{itemize}[leftmargin=0.15in, label={}]',
+        r'    \small{\item{',
+        ' \\\\\n'.join(rows),
+        r'    }}',
+        r' \end{itemize}',
+    ]
+
+
+def _simple_section(section):
+    lines = [f'\\section{{{escape_latex(section.get("title"))}}}',
+             r'  \resumeSubHeadingListStart',
+             r'    \item[]']
+    lines += _bullets(section.get('bullets'))
+    lines.append(r'  \resumeSubHeadingListEnd')
+    return lines
+
+
+def render_resume(data):
+    """
+    data: {"heading": {...}, "education": [...], "experience": [...],
+           "projects": [...], "skills": [...], "extra_sections": [...]}
+    Empty sections are left out.
+    """
+    data = data or {}
+    body = _heading(data.get('heading') or {})
+    if _list(data.get('education')):
+        body += [''] + _education(_list(data['education']))
+    if _list(data.get('experience')):
+        body += [''] + _experience(_list(data['experience']))
+    if _list(data.get('projects')):
+        body += [''] + _projects(_list(data['projects']))
+    if _list(data.get('skills')):
+        body += [''] + _skills(_list(data['skills']))
+    for section in _list(data.get('extra_sections')):
+        body += [''] + _simple_section(section)
+
+    return RESUME_PREAMBLE + '\n\\begin{document}\n\n' + '\n'.join(body) + '\n\n\\end{document}\n'
+
+
+def render_cover_letter(data):
+    """
+    data: {"name", "phone", "email", "recipient", "company",
+           "salutation", "paragraphs": [...], "closing"}
+    """
+    data = data or {}
+    name = escape_latex(data.get('name') or 'First Last')
+    sender = [name] + [escape_latex(data[k]) for k in ('phone', 'email') if data.get(k)]
+    recipient = [escape_latex(data.get('recipient') or 'Hiring Manager')]
+    if data.get('company'):
+        recipient.append(escape_latex(data['company']))
+    paragraphs = [escape_latex(p) for p in _list(data.get('paragraphs'))]
+
+    lines = [
+        r'\begin{document}',
+        r'\pagestyle{empty}',
+        '',
+        r'\begin{flushleft}',
+        '\\\\\n'.join(sender),
+        r'\end{flushleft}',
+        '',
+        r'\vspace{0.5cm}',
+        '',
+        r'\today',
+        '',
+        r'\vspace{0.5cm}',
+        '',
+        '\\\\\n'.join(recipient),
+        '',
+        r'\vspace{0.5cm}',
+        '',
+        escape_latex(data.get('salutation') or 'Dear Hiring Manager,'),
+        '',
+    ]
+    for p in paragraphs:
+        lines += [p, '']
+    lines += [escape_latex(data.get('closing') or 'Sincerely,'), '', name, '', r'\end{document}']
+    return COVER_LETTER_PREAMBLE + '\n' + '\n'.join(lines) + '\n'
@@ -0,0 +1,111 @@
+# Find and replace one block of a generated document, for /generate/edit.
+# Resumes are split on \section{Title} (latex_render.py and the prompt-mode
+# template) or \begin{rSection}{Title}...\end{rSection} (LaTex/main.tex).
+# Cover letters are split into their body paragraphs, addressed as
+# "paragraph 2" (or just 2), counting from 1.
+
+import re
+from collections import namedtuple
+
+# A section runs to the next one, or to \end{document}
+_SECTION_RE = re.compile(r'\\section\*?\{([^{}]*)\}')
+_RSECTION_RE = re.compile(r'\\begin\{rSection\}\{([^{}]*)\}(.*?)\\end\{rSection\}', re.S)
+_END_DOCUMENT = '\\end{document}'
+_PARAGRAPH_RE = re.compile(r'^(?:paragraph\s*)?#?(\d+)$', re.I)
+
+# title: "Projects" or "paragraph 2"; head/tail: the LaTeX kept around the body
+# (the \section line, rSection begin/end); start/end: offsets of the body,
+# surrounding whitespace excluded
+Block = namedtuple('Block', 'title head body tail start end')
+
+
+class SectionNotFound(ValueError):
+    """The requested section isn't in the document"""
+
+    def __init__(self, section, available):
+        super().__init__(f"No section {section!r} in the document")
+        self.available = available
+
+
+def _document_body(latex):
+    begin = latex.find('\\begin{document}')
+    start = begin + len('\\begin{document}') if begin != -1 else 0
+    end = latex.rfind(_END_DOCUMENT)
+    return start, end if end > start else len(latex)
+
+
+def _block(latex, title, head, tail, start, end):
+    # The body without the whitespace around it, which stays where it is
+    text = latex[start:end]
+    start += len(text) - len(text.lstrip())
+    end -= len(text) - len(text.rstrip())
+    return Block(title, head, latex[start:end], tail, start, max(start, end))
+
+
+def _sections(latex):
+    blocks = []
+    for m in _RSECTION_RE.finditer(latex):
+        head = latex[m.start():m.start(2)]
+        blocks.append(_block(latex, m.group(1).strip(), head, '\\end{rSection}', m.start(2), m.end(2)))
+    if blocks:
+        return blocks
+
+    _, doc_end = _document_body(latex)
+    matches = [m for m in _SECTION_RE.finditer(latex) if m.start() < doc_end]
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else doc_end
+        blocks.append(_block(latex, m.group(1).strip(), m.group(0), '', m.end(), end))
+    return blocks
+
+
+def _is_paragraph(text):
+    # Body prose: not a command block, salutation/closing ("Dear ...,",
+    # "Sincerely,") or the signature line
+    return not text.startswith('\\') and text.rstrip()[-1:] in '.!?' and len(text.split()) > 3
+
+
+def _paragraphs(latex):
+    start, end = _document_body(latex)
+    blocks = []
+    for m in re.finditer(r'\S(?:.|\n(?![ \t]*\n))*', latex[start:end]):
+        text = m.group(0).rstrip()
+        if _is_paragraph(text):
+            offset = start + m.start()
+            blocks.append(Block(f'paragraph {len(blocks) + 1}', '', text, '', offset, offset + len(text)))
+    return blocks
+
+
+def list_sections(latex):
+    """Titles of the editable blocks: section titles, else paragraph numbers"""
+    return [block.title for block in (_sections(latex) or _paragraphs(latex))]
+
+
+def find_section(latex, section):
+    """
+    Block for section: a section title ("Projects", "\\section{Projects}",
+    case-insensitive) or a cover-letter paragraph ("paragraph 2", 2).
+    Raises SectionNotFound.
+    """
+    wanted = str(section).strip()
+    m = _SECTION_RE.fullmatch(wanted) or re.fullmatch(r'\\begin\{rSection\}\{([^{}]*)\}', wanted)
+    if m:
+        wanted = m.group(1).strip()
+
+    number = _PARAGRAPH_RE.match(wanted)
+    if number:
+        paragraphs = _paragraphs(latex)
+        index = int(number.group(1)) - 1
+        if 0 <= index < len(paragraphs):
+            return paragraphs[index]
+        raise SectionNotFound(section, [block.title for block in paragraphs])
+
+    sections = _sections(latex)
+    for block in sections:
+        if block.title.lower() == wanted.lower():
+            return block
+    raise SectionNotFound(section, [block.title for block in sections] or list_sections(latex))
+
+
+def replace_section(latex, block, body):
+    """latex with block's body replaced, keeping its heading and spacing in place"""
+    return latex[:block.start] + body.strip() + latex[block.end:]
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    # Whitespace-only differences (trailing spaces, CRLF, blank runs) shouldn't
+    # cost another completion
+    if isinstance(value, str):
+        lines = value.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        return '\n'.join(line.rstrip() for line in lines).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def generation_cache_key(model, prompt_version, user_content):
+    """Key for one generation: model + system prompt version + normalized inputs"""
+    blob = json.dumps(
+        {"model": model, "prompt": prompt_version, "input": _normalize(user_content)},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """One upstream call in flight; threads wait on done, coroutines on a future"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.futures = []   # (loop, asyncio.Future) per async waiter
+
+    def add_future(self):
+        # Caller holds the cache lock, with the call still in flight
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.futures.append((loop, future))
+        return future
+
+    def notify(self):
+        # After the call left the in-flight map, so no waiter is added meanwhile
+        self.done.set()
+        for loop, future in self.futures:
+            try:
+                loop.call_soon_threadsafe(_settle, future, self.result, self.error)
+            except RuntimeError:
+                pass    # that waiter's loop is gone
+
+
+def _settle(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+        # Waiters re-raise it; don't warn if the waiter went away
+        future.exception()
+    else:
+        future.set_result(result)
+
+
+class GenerationCache:
+    """
+    TTL + LRU cache of parsed model results, with singleflight: concurrent
+    get_or_compute() and get_or_compute_async() calls for the same key share
+    one upstream call, whichever of them starts it (e.g. a job-queue thread
+    and a request on the event loop). Failures are handed to every waiter but
+    never cached.
+    """
+
+    def __init__(self, max_entries=512, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}             # key -> _Call
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key, now):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key):
+        with self._lock:
+            value = self._lookup(key, time.time())
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        # Caller holds the lock
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _join(self, key, on_loop):
+        """
+        (value, call, waiting): value on a hit; call, a new _Call, if the
+        caller leads; else waiting, the leader's _Call to wait on, or for a
+        coroutine (on_loop) a future it settles.
+        """
+        with self._lock:
+            value = self._lookup(key, time.time())
+            if value is not None:
+                self.hits += 1
+                return value, None, None
+            call = self._inflight.get(key)
+            if call is None:
+                self._inflight[key] = _Call()
+                self.misses += 1
+                return None, self._inflight[key], None
+            self.coalesced += 1
+            return None, None, (call.add_future() if on_loop else call)
+
+    def _finish(self, key, call):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if call.error is None and call.result is not None:
+                self._store(key, call.result)
+        call.notify()
+
+    def get_or_compute(self, key, compute):
+        """Return (value, source) where source is 'hit', 'coalesced' or 'miss'"""
+        value, call, waiting = self._join(key, on_loop=False)
+        if value is not None:
+            return value, "hit"
+        if waiting is not None:
+            waiting.done.wait()
+            if waiting.error is not None:
+                raise waiting.error
+            return waiting.result, "coalesced"
+
+        try:
+            call.result = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call.result, "miss"
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        get_or_compute() for the async server: compute is a coroutine function
+        and waiters await a future instead of blocking a thread.
+        """
+        value, call, waiting = self._join(key, on_loop=True)
+        if value is not None:
+            return value, "hit"
+        if waiting is not None:
+            # shield: a waiter going away must not cancel the shared result
+            return await asyncio.shield(waiting), "coalesced"
+
+        try:
+            call.result = await compute()
+        except asyncio.CancelledError:
+            # The leader's client went away; waiters shouldn't look cancelled themselves
+            call.error = RuntimeError("Shared generation was cancelled")
+            raise
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call.result, "miss"
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+                "hit_rate": ((self.hits + self.coalesced) / lookups) if lookups else 0.0,
+            }
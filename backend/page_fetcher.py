@@ -0,0 +1,225 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; job-scraper/1.0)"
+
+# Tags whose text never shows up on the page
+_SKIP_TAGS = {"script", "style", "template", "noscript"}
+
+
+class _BudgetReached(Exception):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Collects visible text the way the old BeautifulSoup code did, but stops
+    parsing as soon as max_chars of text have been gathered.
+    mode: 'article' / 'main' (all text inside the first such element),
+          'p' (text of each <p>), or 'all' (everything).
+    """
+
+    def __init__(self, mode, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.mode = mode
+        self.max_chars = max_chars
+        self.pieces = []
+        self.size = 0
+        self._skip = 0
+        self._region_depth = 0      # >0 while inside the target article/main/p
+        self._paragraph = []
+
+    def _add(self, text):
+        self.pieces.append(text)
+        self.size += len(text) + 1
+        if self.size > self.max_chars:
+            raise _BudgetReached()
+
+    def _end_paragraph(self):
+        text = "".join(self._paragraph).strip()
+        self._paragraph = []
+        self._add(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        if tag != self.mode:
+            return
+        if self.mode == "p" and self._region_depth:
+            # <p> can't nest; a new one implicitly closes the open one
+            self._end_paragraph()
+            return
+        self._region_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS and self._skip:
+            self._skip -= 1
+        if tag != self.mode or not self._region_depth:
+            return
+        self._region_depth -= 1
+        if self._region_depth == 0:
+            if self.mode == "p":
+                self._end_paragraph()
+            else:
+                # Only the first article/main counts
+                raise _BudgetReached()
+
+    def close(self):
+        super().close()
+        if self.mode == "p" and self._region_depth:
+            self._region_depth = 0
+            self._end_paragraph()
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self.mode == "p":
+            if self._region_depth:
+                self._paragraph.append(data.strip())
+            return
+        if self.mode == "all" or self._region_depth:
+            text = data.strip()
+            if text:
+                self._add(text)
+
+
+def extract_visible_text(html, max_chars):
+    """
+    Prefer <article> or <main> sections if present, then <p> paragraphs, then
+    all text. Parsing stops once max_chars of text has been collected.
+    """
+    if re.search(r"<article[\s>]", html, re.I):
+        mode = "article"
+    elif re.search(r"<main[\s>]", html, re.I):
+        mode = "main"
+    elif re.search(r"<p[\s>]", html, re.I):
+        mode = "p"
+    else:
+        mode = "all"
+
+    parser = _TextExtractor(mode, max_chars)
+    try:
+        parser.feed(html)
+        parser.close()
+    except _BudgetReached:
+        pass
+    text = "\n".join(parser.pieces)
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n... [truncated]"
+    return text
+
+
+class PageFetcher:
+    """
+    Job posting fetcher with a pooled session and a URL-keyed cache of the
+    extracted text. Entries younger than fresh_for seconds are served as-is;
+    older ones are revalidated with If-None-Match / If-Modified-Since and a
+    304 reuses the cached text.
+    """
+
+    def __init__(self, session=None, max_entries=256, fresh_for=600, timeout=8, pool_size=32):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+        self.max_entries = max_entries
+        self.fresh_for = fresh_for
+        self.timeout = timeout
+        self._entries = OrderedDict()   # (url, max_chars) -> entry dict
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put_entry(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _begin(self, key):
+        """(fresh cached text or None, cached entry, conditional request headers, now)"""
+        entry = self._get_entry(key)
+        now = time.time()
+        if entry is not None and now - entry["fetched_at"] < self.fresh_for:
+            with self._lock:
+                self.hits += 1
+            return entry["text"], entry, {}, now
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return None, entry, headers, now
+
+    def _finish(self, key, entry, now, resp):
+        # resp is a requests or httpx response; both have this interface
+        if resp.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            self._put_entry(key, dict(entry, fetched_at=now))
+            return entry["text"]
+
+        resp.raise_for_status()
+        with self._lock:
+            self.misses += 1
+        text = extract_visible_text(resp.text, key[1])
+        self._put_entry(key, {
+            "text": text,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": now,
+        })
+        return text
+
+    def fetch_text(self, url, max_chars=4000):
+        """Visible text of the page at url, at most max_chars. Raises on HTTP errors."""
+        key = (url, max_chars)
+        text, entry, headers, now = self._begin(key)
+        if text is not None:
+            return text
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        return self._finish(key, entry, now, resp)
+
+    async def fetch_text_async(self, client, url, max_chars=4000):
+        """fetch_text() over an httpx.AsyncClient, sharing the same cache"""
+        key = (url, max_chars)
+        text, entry, headers, now = self._begin(key)
+        if text is not None:
+            return text
+        resp = await client.get(url, headers=headers, timeout=self.timeout, follow_redirects=True)
+        return self._finish(key, entry, now, resp)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.revalidated) / lookups) if lookups else 0.0,
+            }
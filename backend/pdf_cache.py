@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def latex_cache_key(latex_content):
+    """
+    Content address for a (normalized) LaTeX document.
+    Trailing whitespace and line ending differences don't change the PDF,
+    so they are folded away before hashing.
+    """
+    lines = latex_content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    normalized = '\n'.join(line.rstrip() for line in lines).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class PDFCache:
+    """
+    Two-tier cache of compiled PDFs keyed by latex_cache_key().
+    - memory tier: LRU bounded by total bytes
+    - disk tier (optional): one <key>.pdf file per entry, survives restarts;
+      LRU (by file mtime across restarts) bounded by disk_max_bytes
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._disk_entries = OrderedDict()  # key -> file size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not create PDF cache dir {self.disk_dir}: {e}")
+                self.disk_dir = None
+        if self.disk_dir:
+            self._load_disk_index()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.pdf')
+
+    def _load_disk_index(self):
+        # Files left by earlier runs, oldest first, then trimmed to the cap
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.pdf') and entry.is_file():
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name[:-len('.pdf')], st.st_size))
+        for _, key, size in sorted(files):
+            self._disk_entries[key] = size
+            self._disk_size += size
+        self._delete_from_disk(self._evict_disk())
+
+    def _evict_disk(self):
+        # Caller holds the lock (or is __init__). Returns the keys to delete.
+        evicted = []
+        while self._disk_size > self.disk_max_bytes and self._disk_entries:
+            key, size = self._disk_entries.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _delete_from_disk(self, keys):
+        for key in keys:
+            try:
+                os.unlink(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict cached PDF {key}: {e}")
+
+    def _remember(self, key, pdf_bytes):
+        # Caller holds the lock
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = pdf_bytes
+        self._size += len(pdf_bytes)
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pdf_bytes
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    pdf_bytes = f.read()
+            except FileNotFoundError:
+                pdf_bytes = None
+            except OSError as e:
+                logger.warning(f"Could not read cached PDF {key}: {e}")
+                pdf_bytes = None
+            if pdf_bytes:
+                with self._lock:
+                    self._remember(key, pdf_bytes)
+                    if key in self._disk_entries:
+                        self._disk_entries.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                try:
+                    # Keeps the LRU order for the next restart
+                    os.utime(self._disk_path(key))
+                except OSError:
+                    pass
+                return pdf_bytes
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, pdf_bytes):
+        with self._lock:
+            self._remember(key, pdf_bytes)
+
+        if self.disk_dir and len(pdf_bytes) <= self.disk_max_bytes:
+            # Write to a temp file and rename so readers never see a partial PDF
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(pdf_bytes)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError as e:
+                logger.warning(f"Could not write cached PDF {key}: {e}")
+                if tmp_path is not None:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+                return
+            with self._lock:
+                self._disk_size += len(pdf_bytes) - self._disk_entries.pop(key, 0)
+                self._disk_entries[key] = len(pdf_bytes)
+                evicted = self._evict_disk()
+            self._delete_from_disk(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "disk_dir": self.disk_dir,
+                "disk_entries": len(self._disk_entries),
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes,
+            }
@@ -0,0 +1,134 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+
+def _extract_pages(file_bytes, start, stop):
+    # Runs in a worker process: parse the PDF and extract a range of pages
+    reader = PdfReader(io.BytesIO(file_bytes))
+    return [(page.extract_text() or "") for page in reader.pages[start:stop]]
+
+
+class PDFTextExtractor:
+    """
+    Resume PDF -> text, cached by a hash of the file contents.
+    The first parallel_min_pages pages are extracted in-process, stopping as
+    soon as max_chars is reached. If the budget still isn't met, the remaining
+    pages are split into ranges and extracted on a process pool (page text
+    extraction is CPU bound pure Python, so threads wouldn't help).
+    """
+
+    def __init__(self, max_entries=256, workers=None, parallel_min_pages=8):
+        self.max_entries = max_entries
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        self._entries = OrderedDict()   # (sha256, max_chars) -> text
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Not fork: the server has threads (and their locks) running,
+                # which a forked child would inherit in whatever state they were
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(start_method))
+            return self._pool
+
+    def extract(self, file_bytes, max_chars=8000, timings=None):
+        """
+        Returns the text (truncated to max_chars). If timings is a dict, it gets
+        "pdf_extract_seconds" and "pdf_cache" ("hit" / "miss").
+        """
+        started = time.perf_counter()
+        key = (hashlib.sha256(file_bytes).hexdigest(), max_chars)
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        source = "hit" if text is not None else "miss"
+
+        if text is None:
+            text = self._extract_uncached(file_bytes, max_chars)
+            with self._lock:
+                self._entries[key] = text
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Extracted resume PDF text in {elapsed * 1000:.1f} ms (cache {source})")
+        if timings is not None:
+            timings["pdf_extract_seconds"] = elapsed
+            timings["pdf_cache"] = source
+        return text
+
+    def _extract_uncached(self, file_bytes, max_chars):
+        reader = PdfReader(io.BytesIO(file_bytes))
+        page_count = len(reader.pages)
+
+        texts = []
+        size = 0
+        # Sequential first: most resumes hit the budget within a few pages
+        sequential = page_count if self.workers <= 1 else min(page_count, self.parallel_min_pages)
+        for page in reader.pages[:sequential]:
+            page_text = page.extract_text() or ""
+            texts.append(page_text)
+            # Running total instead of re-summing every page seen so far
+            size += len(page_text) + 1
+            if size > max_chars:
+                break
+
+        if size <= max_chars and sequential < page_count:
+            # Long, text-sparse (e.g. scanned) PDF: spread the rest over the pool
+            remaining = page_count - sequential
+            chunk = -(-remaining // self.workers)
+            futures = [
+                self._executor().submit(_extract_pages, file_bytes, start, min(start + chunk, page_count))
+                for start in range(sequential, page_count, chunk)
+            ]
+            # Consume in page order; later ranges are dropped once the budget is met
+            for future in futures:
+                if size > max_chars:
+                    future.cancel()
+                    continue
+                for page_text in future.result():
+                    texts.append(page_text)
+                    size += len(page_text) + 1
+                    if size > max_chars:
+                        break
+
+        # Pages end in a form feed so dedupe_resume_text() can tell page
+        # headers and footers from lines that just happen to repeat
+        text = "\f".join(texts)
+        if len(text) > max_chars:
+            text = text[:max_chars] + "\n... [truncated]"
+        return text
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "workers": self.workers,
+            }
@@ -0,0 +1,231 @@
+# Token-budgeted preprocessing of the /generate inputs.
+# Job postings are split into segments, scored for how much they say about the
+# role (requirements, responsibilities, skills) versus boilerplate (cookie
+# banners, benefits, EEO text), and the best segments are packed into a token
+# budget in their original order. Resumes over budget lose PDF page
+# headers/footers and repeated blocks, then are cut to the budget in order.
+
+import logging
+import re
+import threading
+
+try:
+    import tiktoken
+    _HAS_TIKTOKEN = True
+except Exception:
+    _HAS_TIKTOKEN = False
+
+logger = logging.getLogger(__name__)
+
+_encodings = {}
+_resolving = set()     # models whose encoding is being looked up
+_encodings_lock = threading.Lock()
+
+_RELEVANT_CUES = [
+    (re.compile(r"\b(requirements?|qualifications?|must[- ]have|required)\b", re.I), 4.0),
+    (re.compile(r"\b(responsibilit(y|ies)|what you('ll| will) do|you will|day[- ]to[- ]day|duties)\b", re.I), 3.0),
+    (re.compile(r"\b(skills?|experience (with|in)|proficien(t|cy)|familiar(ity)? with|knowledge of)\b", re.I), 2.5),
+    (re.compile(r"\b(nice[- ]to[- ]have|preferred|bonus|plus)\b", re.I), 1.5),
+    (re.compile(r"\b\d+\+?\s*(years?|yrs)\b", re.I), 2.0),
+    (re.compile(r"\b(about the (role|team|position)|the role|job description|position summary)\b", re.I), 2.0),
+    (re.compile(r"\b(degree|bachelor'?s?|master'?s?|ph\.?d|computer science)\b", re.I), 1.0),
+]
+_BOILERPLATE_CUES = [
+    re.compile(r"\b(cookies?|privacy (policy|notice)|terms of (use|service)|all rights reserved)\b", re.I),
+    re.compile(r"\b(equal (employment )?opportunity|eeo|affirmative action|protected veteran|disabilit(y|ies)|"
+               r"race|religion|sexual orientation|gender identity|national origin)\b", re.I),
+    re.compile(r"\b(benefits?|401\(?k\)?|pto|paid time off|health(care)?|dental|vision insurance|perks|"
+               r"parental leave|wellness|stipend)\b", re.I),
+    re.compile(r"\b(sign in|log in|apply now|share this job|save job|similar jobs|job alert|subscribe|"
+               r"follow us|back to (search|jobs))\b", re.I),
+    re.compile(r"\b(reasonable accommodation|e-verify|background check)\b", re.I),
+]
+# Tokens that look like technologies: Python, AWS, C++, Node.js, k8s ...
+_TECH_TOKEN = re.compile(r"\b(?:[A-Z][a-z]+[A-Z]\w*|[A-Z]{2,}\w*|\w+\+\+|\w+#|\w+\.(?:js|net|io)|[A-Za-z]+\d+\w*)\b")
+
+
+def _encoding(model):
+    """
+    The model's tokenizer, or None to estimate. The first lookup may download
+    the encoding file; it runs outside the lock, and other callers estimate
+    meanwhile instead of queueing behind it. A failed lookup is remembered.
+    """
+    if not _HAS_TIKTOKEN:
+        return None
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+        if model in _resolving:
+            return None
+        _resolving.add(model)
+    try:
+        try:
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Encoding files are downloaded on first use; fall back if that fails
+            logger.warning(f"tiktoken encoding unavailable for {model}, estimating token counts: {e}")
+            enc = None
+        with _encodings_lock:
+            _encodings[model] = enc
+        return enc
+    finally:
+        with _encodings_lock:
+            _resolving.discard(model)
+
+
+def count_tokens(text, model="gpt-4"):
+    """Token count with the model's tokenizer (about 4 chars/token without tiktoken)"""
+    enc = _encoding(model)
+    if enc is None:
+        return -(-len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, budget, model="gpt-4"):
+    enc = _encoding(model)
+    if enc is None:
+        return text[:budget * 4]
+    tokens = enc.encode(text, disallowed_special=())
+    return enc.decode(tokens[:budget])
+
+
+def _is_heading(line):
+    stripped = line.strip()
+    if not stripped or len(stripped) > 60:
+        return False
+    if stripped.endswith(":"):
+        return True
+    words = stripped.split()
+    return len(words) <= 6 and not stripped.endswith((".", ",")) and (
+        stripped.isupper() or all(w[0].isupper() for w in words if w[0].isalpha())
+    )
+
+
+def segment_text(text):
+    """Split text into segments at blank lines and heading-like lines"""
+    segments = []
+    current = []
+    for line in text.split("\n"):
+        if not line.strip():
+            if current:
+                segments.append("\n".join(current))
+                current = []
+            continue
+        if _is_heading(line) and current:
+            segments.append("\n".join(current))
+            current = []
+        current.append(line.rstrip())
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+
+def score_segment(segment, index, total):
+    words = max(1, len(segment.split()))
+    score = 0.0
+    for pattern, weight in _RELEVANT_CUES:
+        score += weight * len(pattern.findall(segment))
+    score += 0.5 * len(_TECH_TOKEN.findall(segment))
+    boilerplate = sum(len(p.findall(segment)) for p in _BOILERPLATE_CUES)
+    score -= 3.0 * boilerplate
+    # Normalize so long segments don't win on size alone, then prefer earlier text slightly
+    score = score / (words ** 0.5)
+    score += 0.5 * (1 - index / max(1, total))
+    return score
+
+
+def select_relevant_text(text, budget_tokens, model="gpt-4"):
+    """
+    Pack the highest-scoring segments of a job posting into budget_tokens,
+    keeping them in their original order.
+    """
+    text = text.strip()
+    if not text or count_tokens(text, model) <= budget_tokens:
+        return text
+
+    segments = segment_text(text)
+    scored = sorted(
+        ((score_segment(s, i, len(segments)), i, s) for i, s in enumerate(segments)),
+        key=lambda item: (-item[0], item[1]),
+    )
+    chosen = []
+    used = 0
+    for score, i, segment in scored:
+        if score <= 0 and chosen:
+            break
+        cost = count_tokens(segment, model) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.append((i, segment))
+        used += cost
+
+    if not chosen:
+        # Nothing fits whole (e.g. one giant segment): trim the best one
+        return truncate_to_tokens(scored[0][2], budget_tokens, model)
+
+    chosen.sort()
+    logger.info(f"Kept {len(chosen)}/{len(segments)} job posting segments ({used} tokens)")
+    return "\n\n".join(segment for _, segment in chosen)
+
+
+# Consecutive lines that must repeat together to count as a duplicated block
+_REPEATED_BLOCK_LINES = 3
+
+
+def _edge_key(line):
+    # "Page 1 of 3" and "Page 2 of 3" are the same footer
+    return re.sub(r"\d+", "#", line.lower())
+
+
+def _running_lines(pages):
+    """(edge, key) of page-first/last lines repeated on two or more pages"""
+    counts = {}
+    for page in pages:
+        if page:
+            for edge in {("top", _edge_key(page[0])), ("bottom", _edge_key(page[-1]))}:
+                counts[edge] = counts.get(edge, 0) + 1
+    return {edge for edge, count in counts.items() if count >= 2}
+
+
+def dedupe_resume_text(text, budget_tokens, model="gpt-4"):
+    """
+    Collapse whitespace and, if the resume is over budget_tokens, drop PDF
+    page headers/footers and whole repeated blocks (duplicated sections)
+    before cutting to budget_tokens. Single repeated lines stay: two roles
+    can share a title or a bullet. Pages are separated by form feeds.
+    """
+    pages = []
+    for page in text.split("\f"):
+        lines = [re.sub(r"\s+", " ", line).strip() for line in page.split("\n")]
+        pages.append([line for line in lines if line])
+    collapsed = "\n".join(line for page in pages for line in page)
+    if count_tokens(collapsed, model) <= budget_tokens:
+        return collapsed
+
+    running = _running_lines(pages) if len(pages) > 1 else set()
+    lines = []
+    for page in pages:
+        for i, line in enumerate(page):
+            if (i == 0 and ("top", _edge_key(line)) in running) or \
+                    (i == len(page) - 1 and ("bottom", _edge_key(line)) in running):
+                continue
+            lines.append(line)
+
+    seen_blocks = set()
+    kept = []
+    skip_until = 0
+    for i in range(len(lines)):
+        block = tuple(line.lower() for line in lines[i:i + _REPEATED_BLOCK_LINES])
+        if len(block) == _REPEATED_BLOCK_LINES and block in seen_blocks:
+            skip_until = i + _REPEATED_BLOCK_LINES
+        seen_blocks.add(block)
+        if i >= skip_until:
+            kept.append(lines[i])
+
+    deduped = "\n".join(kept)
+    if count_tokens(deduped, model) > budget_tokens:
+        deduped = truncate_to_tokens(deduped, budget_tokens, model)
+    return deduped
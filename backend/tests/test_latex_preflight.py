@@ -0,0 +1,77 @@
+from latex_preflight import preflight_latex
+
+PREAMBLE = "\\documentclass{article}\n\\newcommand{\\resumeItem}[1]{\\item #1}\n"
+
+
+def body_of(result):
+    return result.latex.split("\\begin{document}", 1)[1]
+
+
+def test_currency_before_project_heading_separator():
+    latex = (PREAMBLE + "\\begin{document}\n\\begin{itemize}\n"
+             "\\item Cut costs by $50K per year\n"
+             "\\item Built \\textbf{Proj} $|$ \\emph{Python}\n"
+             "\\end{itemize}\n\\end{document}\n")
+    result = preflight_latex(latex)
+    assert result.ok
+    body = body_of(result)
+    assert "by \\$50K per year" in body
+    assert "\\textbf{Proj} $|$ \\emph{Python}" in body
+
+
+def test_hash_before_digit_is_escaped_in_body_text():
+    latex = PREAMBLE + "\\begin{document}\nRanked #1 of 200 teams\n\\end{document}\n"
+    result = preflight_latex(latex)
+    assert result.ok
+    assert "Ranked \\#1 of 200 teams" in body_of(result)
+
+
+def test_hash_parameters_kept_in_body_definitions():
+    latex = (PREAMBLE + "\\begin{document}\n"
+             "\\newcommand{\\pair}[2]{#1 and #2}\n"
+             "\\def\\twice#1{#1#1}\n"
+             "\\pair{a}{b} is #3\n\\end{document}\n")
+    body = body_of(preflight_latex(latex))
+    assert "\\newcommand{\\pair}[2]{#1 and #2}" in body
+    assert "\\def\\twice#1{#1#1}" in body
+    assert "is \\#3" in body
+
+
+def test_dollar_digit_math_stays_math():
+    latex = (PREAMBLE + "\\begin{document}\n"
+             "Processed $10^6$ events, $10\\times$ faster\n\n"
+             "Budget of $5 and $10 per seat\n\n"
+             "Saved $5\n\\end{document}\n")
+    result = preflight_latex(latex)
+    assert result.ok
+    body = body_of(result)
+    assert "Processed $10^6$ events, $10\\times$ faster" in body
+    assert "Budget of \\$5 and \\$10 per seat" in body
+    assert "Saved \\$5" in body
+
+
+def test_resume_list_macros_balance_environments():
+    from latex_preambles import RESUME_PREAMBLE
+    latex = (RESUME_PREAMBLE + "\\begin{document}\n"
+             "\\section{Experience}\n\\resumeSubHeadingListStart\n"
+             "\\resumeSubheading{Acme}{NYC}{Intern}{2023}\n"
+             "\\begin{itemize}\n\\resumeItem{Built things}\n\\resumeItemListEnd\n"
+             "\\end{itemize}\n\\end{document}\n")
+    result = preflight_latex(latex)
+    assert result.ok, result.errors
+    assert body_of(result) == latex.split("\\begin{document}", 1)[1]
+
+
+def test_undefined_resume_macro_is_a_warning():
+    latex = PREAMBLE + "\\begin{document}\n\\resumeThing{x}\n\\end{document}\n"
+    result = preflight_latex(latex)
+    assert result.ok
+    assert result.warnings == ["Undefined macro \\resumeThing"]
+
+
+def test_underscores_kept_in_inline_math_and_verb():
+    latex = (PREAMBLE + "\\begin{document}\n"
+             "Inline \\(x_1\\), display \\[y_2\\], \\verb|a_b| and snake_case\n"
+             "\\end{document}\n")
+    body = body_of(preflight_latex(latex))
+    assert "Inline \\(x_1\\), display \\[y_2\\], \\verb|a_b| and snake\\_case" in body
@@ -0,0 +1,15 @@
+from relevance import dedupe_resume_text
+
+ROLES = ("Software Engineer Intern\nAcme Corp\nBuilt APIs\nWrote tests\n"
+         "Software Engineer Intern\nBeta Inc\nBuilt APIs\nShipped features")
+
+
+def test_under_budget_resume_only_collapses_whitespace():
+    assert dedupe_resume_text("  Jane   Doe \n\n" + ROLES, 10000) == "Jane Doe\n" + ROLES
+
+
+def test_repeated_role_lines_survive_over_budget():
+    pages = ["Jane Doe - Resume\n" + ROLES + "\nPage 1 of 2",
+             "Jane Doe - Resume\nSkills\nPython\nSQL\nGo\nSkills\nPython\nSQL\nGo\nPage 2 of 2"]
+    deduped = dedupe_resume_text("\f".join(pages), 40)
+    assert deduped == ROLES + "\nSkills\nPython\nSQL\nGo"
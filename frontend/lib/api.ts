@@ -40,6 +40,68 @@ export async function generateDocuments(
   return response.json();
 }
 
+export type GenerateStreamKey = keyof GenerateResponse['result'];
+
+/**
+ * Stream generation over Server-Sent Events. onPart fires as soon as each
+ * top-level key (resume_suggestions, optimized_resume, optimized_cover_letter)
+ * is complete, so the resume can be compiled while the cover letter is still
+ * being written. Resolves with the full result.
+ */
+export async function generateDocumentsStream(
+  resumeFile: File,
+  jobDescription: string,
+  onPart: (key: GenerateStreamKey, value: string | string[]) => void
+): Promise<GenerateResponse> {
+  const formData = new FormData();
+  formData.append('resume_pdf', resumeFile);
+  formData.append('jobDescription', jobDescription);
+
+  const response = await fetch(`${API_BASE_URL}/generate/stream`, {
+    method: 'POST',
+    body: formData,
+  });
+
+  if (!response.ok || !response.body) {
+    const error: ErrorResponse = await response.json().catch(() => ({ error: 'Failed to generate documents' }));
+    throw new Error(error.error || 'Failed to generate documents');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      const payload = data ? JSON.parse(data) : null;
+
+      if (event === 'error') {
+        throw new Error(payload?.error || 'Failed to generate documents');
+      }
+      if (event === 'done') {
+        return payload as GenerateResponse;
+      }
+      onPart(event as GenerateStreamKey, payload);
+    }
+  }
+
+  throw new Error('Generation stream ended unexpectedly');
+}
+
 /**
  * Convert LaTeX code to PDF
  */